@@ -1,14 +1,48 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Header, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from haystack.document_stores import InMemoryDocumentStore
 from haystack.nodes import BM25Retriever, TransformersReader
-from haystack.pipelines import ExtractiveQAPipeline
 from transformers import DistilBertTokenizer, DistilBertForQuestionAnswering
 from haystack.document_stores import MongoDBDocumentStore
 from dotenv import load_dotenv
+from haystack.schema import Document
+from app.utils.text_utils import compute_content_hash, iter_parsed_articles, make_summary
+from app.utils.manifest_utils import load_manifest, new_manifest, save_manifest, manifest_entry, diff_archive
+from app.utils.snapshot_utils import load_snapshot, save_snapshot, restore_snapshot
+from app.utils.startup_utils import StartupTracker
+from app.utils.pagination_utils import encode_cursor, decode_cursor
+from app.utils.projection_utils import parse_fields
+from app.utils.json_utils import FastJSONResponse
+from app.utils.http_cache_utils import cache_control, etag_matches, make_etag
+from app.utils.log_utils import configure_logging, get_logger
+from app.api.models import (
+    Article, ArticlePage, BatchRequest, QueryBatchResponse, QueryResponse, SearchBatchRequest, SearchBatchResponse,
+    SearchResponse
+)
+from app.services.reader_batcher import ReaderBatcher
+from app.services.passage_cache import PassageCache
+from app.services.query_cache import QueryCache, normalize_query, wait_claim
+from app.services.article_order import ArticleOrder
+from app.services.inference_executor import InferenceExecutor, InferenceQueueFull
+from app.services.bm25_engine import SparseBM25Retriever
+from app.services.query_syntax import QuerySyntaxError, parse_query, positive_tokens
+from app.services.compression_middleware import CompressionMiddleware
+from app.services.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, time_stage
+from app.services.request_profiler import ProfileStore, ProfilingMiddleware, token_matches
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import json
 import os
+import time
 
 load_dotenv()
+# LOG_LEVEL=warning keeps per-request logs off, LOG_FORMAT=text for a terminal
+configure_logging()
+log = get_logger("news_api.app")
 
 app = FastAPI()
 
@@ -19,315 +53,1036 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
+)
+# brotli/gzip for responses of COMPRESSION_MIN_SIZE bytes or more
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("GZIP_LEVEL", "5")),
+    brotli_quality=int(os.getenv("BROTLI_QUALITY", "5"))
 )
+# Outermost, so request latencies include compression
+app.add_middleware(MetricsMiddleware)
 
-def parse_article_content(content):
-    """Parse article content with metadata"""
-    lines = content.split('\n')
-    metadata = {}
-    content_lines = []
-    parsing_content = False
-    
-    for line in lines:
-        if line.strip() == '---':
-            parsing_content = True
-            continue
-        if not parsing_content:
-            if ':' in line:
-                key, value = line.split(':', 1)
-                metadata[key.strip().lower()] = value.strip()
-        else:
-            content_lines.append(line)
-    
-    return metadata, '\n'.join(content_lines)
+# Per-request profiles: a request with `X-Profile: <PROFILE_TOKEN>` is
+# profiled, and so is a PROFILE_SAMPLE_RATE share of /query and /search
+# requests. With neither set the middleware isn't installed at all.
+profile_token = os.getenv("PROFILE_TOKEN") or None
+profile_sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+profile_store = ProfileStore(
+    max_profiles=int(os.getenv("PROFILE_KEEP", "50")),
+    directory=os.getenv("PROFILE_DIR") or None  # also write each profile there as <id>.folded
+)
+if profile_token or profile_sample_rate > 0:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        token=profile_token,
+        sample_rate=profile_sample_rate,
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+    )
 
 def init_document_store():
     archive_folder = "./archive_texts"
     
     # Check if directory exists
     if not os.path.exists(archive_folder):
-        print(f"Error: Directory '{archive_folder}' does not exist")
+        log.error("archive_missing", path=archive_folder)
         return
     
     # Get list of text files
     text_files = [f for f in os.listdir(archive_folder) if f.endswith(".txt")]
     if not text_files:
-        print(f"Error: No .txt files found in '{archive_folder}'")
+        log.error("archive_empty", path=archive_folder)
         return
     
-    print(f"Found {len(text_files)} text files")
+    log.info("archive_scanned", path=archive_folder, files=len(text_files))
     
-    if not document_store.get_document_count():
-        documents = []
-        for filename in text_files:
-            try:
-                with open(os.path.join(archive_folder, filename), "r", encoding="utf-8") as file:
-                    content = file.read()
-                    if not content.strip():
-                        print(f"Warning: Empty file {filename}")
-                        continue
-                    
-                    # Parse the metadata and content
-                    metadata, article_content = parse_article_content(content)
-                    
-                    # Extract date from filename if it contains a date (e.g., 20061117)
-                    file_date = None
-                    for part in filename.split('_'):
-                        if len(part) == 8 and part.isdigit():  # Format: YYYYMMDD
-                            year = part[:4]
-                            month = part[4:6]
-                            day = part[6:]
-                            file_date = f"{year}-{month}-{day}"
-                            break
-                    
-                    documents.append({
-                        "content": article_content,
-                        "meta": {
-                            "name": filename,
-                            "title": metadata.get("title", os.path.splitext(filename)[0]),
-                            "author": metadata.get("author", "Unknown"),
-                            "publishDate": metadata.get("date", file_date)  # Use file date as fallback
-                        }
-                    })
-                    print(f"Successfully processed: {filename}")
-                    print(f"Title: {metadata.get('title', 'No title')}")
-                    print(f"Author: {metadata.get('author', 'Unknown')}")
-                    print(f"Date: {metadata.get('date', file_date)}")
-                    print("---")
-            
-            except Exception as e:
-                print(f"Error processing {filename}: {str(e)}")
-        
-        print(f"Attempting to write {len(documents)} documents to store")
-        if documents:
-            document_store.write_documents(documents)
-            print("Successfully wrote documents to store")
+    snapshot = None
+    if document_store.get_document_count():
+        manifest = load_manifest(manifest_path)
+    else:
+        # A fresh store starts from the last snapshot, so only files changed
+        # since then are parsed and only then is BM25 recomputed
+        snapshot = load_snapshot(snapshot_path, document_store) if snapshot_path else None
+        if snapshot:
+            restore_snapshot(document_store, snapshot)
+            manifest = snapshot["manifest"]
+            if hasattr(retriever, "restore_index"):
+                # Used only if no document is written or deleted below
+                retriever.restore_index(snapshot["bm25"], snapshot.get("extras", {}).get("bm25_index"))
+            log.info("snapshot_restored", path=snapshot_path, documents=document_store.get_document_count())
         else:
-            print("No valid documents to write to store")
+            manifest = new_manifest()
+    changed, unchanged, deleted = diff_archive(archive_folder, text_files, manifest)
+    log.info("archive_diff", changed=len(changed), unchanged=len(unchanged), deleted=len(deleted))
+    
+    stale_ids = [manifest["files"].pop(filename)["doc_id"] for filename in deleted]
+    documents = []
+    # Files are read and parsed across all cores, results arrive in order
+    for article in iter_parsed_articles(archive_folder, changed, ingest_workers):
+        filename = article["filename"]
+        if article["error"]:
+            log.error("article_failed", filename=filename, error=article["error"])
+            continue
+        
+        previous = manifest["files"].get(filename)
+        if previous and previous["content_hash"] == article["content_hash"]:
+            # Touched but identical, only the stat info needs refreshing
+            manifest["files"][filename] = manifest_entry(archive_folder, filename, article["content_hash"], previous["doc_id"])
+            continue
+        if previous and previous["doc_id"]:
+            stale_ids.append(previous["doc_id"])
+        
+        if article["empty"]:
+            log.warning("article_empty", filename=filename)
+            manifest["files"][filename] = manifest_entry(archive_folder, filename, article["content_hash"], None)
+            continue
+        
+        metadata = article["metadata"]
+        file_date = article["file_date"]
+        document = Document(
+            content=article["content"],
+            meta={
+                "name": filename,
+                "title": metadata.get("title", os.path.splitext(filename)[0]),
+                "author": metadata.get("author", "Unknown"),
+                "publishDate": metadata.get("date", file_date)  # Use file date as fallback
+            },
+            # Include meta so identical bodies in different files keep separate ids
+            id_hash_keys=["content", "meta"]
+        )
+        # Added after the id is computed so ids stay what they were before summaries
+        document.meta["summary"] = article["summary"]
+        documents.append(document)
+        manifest["files"][filename] = manifest_entry(archive_folder, filename, article["content_hash"], document.id)
+        log.debug("article_processed", filename=filename, title=document.meta["title"],
+                  author=document.meta["author"], date=document.meta["publishDate"])
+    
+    stale_ids = [doc_id for doc_id in stale_ids if doc_id]
+    if stale_ids:
+        document_store.delete_documents(ids=stale_ids)
+        log.info("stale_documents_removed", documents=len(stale_ids))
+    
+    if documents:
+        document_store.write_documents(documents)
+    log.info("documents_written", documents=len(documents), total=document_store.get_document_count())
+    
+    save_manifest(manifest_path, manifest)
+    set_article_etags(manifest)
+    
+    # Build the retrieval and positional index now instead of on the first
+    # search, from the snapshot when it has them
+    index_restored = True
+    if hasattr(retriever, "get_index"):
+        bm25_index = retriever.get_index()
+        index_restored = bm25_index is None or bm25_index.restored
+    # And the /articles order, which parses every publish date
+    get_article_order()
+    # A snapshot whose index couldn't be used (older, or other BM25_POSITIONS) is rewritten with it
+    stale_snapshot = snapshot is not None and not index_restored
+    if snapshot_path and (changed or deleted or stale_snapshot or not os.path.exists(snapshot_path)):
+        extras = {"bm25_index": retriever.index_state()} if hasattr(retriever, "index_state") else None
+        save_snapshot(snapshot_path, document_store, manifest, extras=extras)
+        log.info("snapshot_saved", path=snapshot_path)
 
 # Initialize Haystack components
 model_dir = "./models/distilbert-base-uncased-distilled-squad"
+ingest_workers = int(os.getenv("INGEST_WORKERS", "0")) or None  # 0 = all cores
+manifest_path = os.getenv("STORE_MANIFEST", "./archive_texts/.store_manifest.json")
+snapshot_path = os.getenv("STORE_SNAPSHOT", "./archive_texts/.store_snapshot.pkl")  # empty disables snapshots
+reader_backend = os.getenv("READER_BACKEND", "transformers")  # "transformers", "onnx" or "remote"
+passage_cache_dir = os.getenv("PASSAGE_CACHE_DIR", "./archive_texts/.passage_cache")  # empty disables
+warmup_queries = [q.strip() for q in os.getenv("WARMUP_QUERIES", "What is this about?").split("|") if q.strip()]
+retriever_backend = os.getenv("RETRIEVER_BACKEND", "sparse")  # "sparse" or "haystack"
 document_store = InMemoryDocumentStore(use_bm25=True)
-retriever = BM25Retriever(document_store, top_k=10)
-reader = TransformersReader(
-    model_name_or_path=model_dir,
-    tokenizer=model_dir,
-    context_window_size=500
+if retriever_backend == "haystack":
+    retriever = BM25Retriever(document_store, top_k=10)
+else:
+    retriever = SparseBM25Retriever(
+        document_store,
+        top_k=10,
+        pruning=os.getenv("BM25_PRUNING", "false").lower() in ("1", "true", "yes"),
+        # Positional index for /search previews, costs a tokenization pass whenever the snapshot can't supply it
+        positions=os.getenv("BM25_POSITIONS", "true").lower() in ("1", "true", "yes")
+    )
+
+# The articles and the reader are loaded in the background once the server
+# is accepting connections, see start_background_loading()
+reader = None
+reader_batcher = None
+article_order = None  # (store version, ArticleOrder, sparse index)
+startup = StartupTracker(["index", "reader", "passages", "warmup"])
+startup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+
+# Content hash of each stored article's file by document id, for ETags
+article_etags = {}
+article_max_age = int(os.getenv("ARTICLE_MAX_AGE", "3600"))  # Cache-Control of /articles/{article_id}
+article_list_max_age = int(os.getenv("ARTICLE_LIST_MAX_AGE", "60"))  # Cache-Control of /articles
+
+def set_article_etags(manifest):
+    """Index the ingest-time content hashes so conditional GETs skip the store"""
+    global article_etags
+    article_etags = {
+        entry["doc_id"]: entry["content_hash"] for entry in manifest["files"].values() if entry.get("doc_id")
+    }
+
+def store_version():
+    """Changes whenever documents are written or deleted (the BM25 index is rebuilt then)"""
+    index = document_store.index
+    return (len(document_store.indexes.get(index, {})), document_store.bm25.get(index))
+
+# /search and /query results, QUERY_CACHE_SIZE=0 disables caching
+query_cache = QueryCache(
+    max_entries=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL", "300")),
+    version=store_version
 )
 
-# Initialize the document store with articles
-init_document_store()
+# /query runs its retrieval and reader call here instead of the shared request threadpool
+inference_executor = InferenceExecutor(
+    workers=int(os.getenv("INFERENCE_WORKERS", "4")),
+    max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "16"))
+)
+inference_retry_after = os.getenv("INFERENCE_RETRY_AFTER", "1")  # seconds, sent with 503s when full
+batch_max_queries = int(os.getenv("BATCH_MAX_QUERIES", "256"))  # per /search/batch or /query/batch request
 
-# Create pipeline - Move this up before the endpoints
-pipeline = ExtractiveQAPipeline(reader=reader, retriever=retriever)
-print("Pipeline initialized successfully")  # Debug print
+# Read from the components when /metrics is scraped, nothing is tracked twice
+REGISTRY.gauge("news_api_inference_queue_depth", "/query calls waiting for an inference worker",
+               function=lambda: inference_executor.stats()["queue_depth"])
+REGISTRY.gauge("news_api_inference_running", "/query calls running on an inference worker",
+               function=lambda: inference_executor.stats()["running"])
+REGISTRY.gauge("news_api_inference_rejected_total", "/query calls shed because the inference queue was full",
+               function=lambda: inference_executor.stats()["rejected"], kind="counter")
+REGISTRY.gauge("news_api_reader_batcher_queue_depth", "Reader calls waiting to join a batched forward pass",
+               function=lambda: reader_batcher.queue_depth() if reader_batcher is not None else None)
+REGISTRY.gauge("news_api_query_cache_lookups_total", "/search and /query cache lookups by outcome", ("outcome",),
+               function=lambda: {(outcome,): value for outcome, value in query_cache.stats().items()
+                                 if outcome in ("hits", "misses", "coalesced")}, kind="counter")
+REGISTRY.gauge("news_api_query_cache_hit_ratio", "Share of cache lookups answered without computing",
+               function=lambda: query_cache.stats()["hit_rate"])
+REGISTRY.gauge("news_api_query_cache_entries", "Entries in the /search and /query cache",
+               function=lambda: query_cache.stats()["size"])
+REGISTRY.gauge("news_api_documents", "Documents in the store", function=lambda: store_version()[0])
+REGISTRY.gauge("news_api_component_ready", "1 once a startup component is loaded", ("component",),
+               function=lambda: {(name,): int(component["status"] == "ready")
+                                 for name, component in startup.report().items()})
 
-# Test the pipeline with a simple query
-test_query = "What is this about?"
-try:
-    test_result = pipeline.run(
-        query=test_query,
-        params={"Retriever": {"top_k": 1}, "Reader": {"top_k": 1}}
+def load_reader():
+    global reader, reader_batcher
+    if reader_backend in ("onnx", "remote"):
+        # Imported here so the default backend doesn't need onnxruntime
+        from app.services.onnx_reader import OnnxReader
+        reader = OnnxReader(
+            model_name_or_path=model_dir,
+            onnx_dir=os.getenv("ONNX_DIR") or None,
+            quantize=os.getenv("ONNX_QUANTIZE", "false").lower() in ("1", "true", "yes"),
+            num_threads=int(os.getenv("ONNX_THREADS", "0")) or None,
+            context_window_size=500,
+            # "remote": forward passes run in scripts/model_server.py, shared by all API workers
+            model_socket=os.getenv("READER_SOCKET", "/tmp/news-api-reader.sock") if reader_backend == "remote" else None
+        )
+    else:
+        reader = TransformersReader(
+            model_name_or_path=model_dir,
+            tokenizer=model_dir,
+            context_window_size=500
+        )
+    reader_batcher = ReaderBatcher(
+        reader,
+        max_batch_size=int(os.getenv("READER_BATCH_SIZE", "32")),
+        max_wait_ms=float(os.getenv("READER_BATCH_WAIT_MS", "5"))
     )
-    print("Pipeline test successful:", test_result)
-except Exception as e:
-    print("Pipeline test failed:", str(e))
-
-@app.get("/articles")
-async def get_articles(page: int = 1, limit: int = 10):
-    documents = document_store.get_all_documents()
-    start_idx = (page - 1) * limit
-    end_idx = start_idx + limit
-    paginated_docs = documents[start_idx:end_idx]
+    log.info("reader_loaded", backend=reader_backend)
+
+def retrieve_passages(query: str, top_k: int, filters=None):
+    """Documents the reader should read for `query`, empty ones skipped"""
+    with time_stage("retrieval"):
+        documents = retriever.retrieve(query=query, filters=filters, top_k=top_k)
+    return [doc for doc in documents if doc.content.strip()]
+
+def answer_question(query: str, retriever_top_k: int, reader_top_k: int, filters=None):
+    """Retrieve passages and read answers from them
+
+    The reader call goes through the batcher, so concurrent questions share
+    one forward pass instead of queueing up behind each other.
+    """
+    documents = retrieve_passages(query, retriever_top_k, filters)
+    result = reader_batcher.predict(query=query, documents=documents, top_k=reader_top_k)
+    return {"query": query, "answers": result["answers"], "documents": documents}
+
+def load_passage_cache():
+    """Pre-tokenize every document so queries only tokenize the question"""
+    cache = PassageCache(passage_cache_dir, reader.tokenizer)
+    cache.build(document_store.get_all_documents())
+    reader.passage_cache = cache
+
+def warm_up():
+    """Run the warmup queries so the first real /query doesn't pay lazy-init costs"""
+    for query in warmup_queries:
+        result = answer_question(query, retriever_top_k=1, reader_top_k=1)
+        log.info("warmup_query", query=query, answers=len(result["answers"]))
+
+async def load_components():
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        loop.run_in_executor(startup_executor, startup.run, "index", init_document_store),
+        loop.run_in_executor(startup_executor, startup.run, "reader", load_reader)
+    )
+    if startup.is_ready("index", "reader"):
+        if passage_cache_dir and hasattr(reader, "passage_cache"):
+            await loop.run_in_executor(startup_executor, startup.run, "passages", load_passage_cache)
+        else:
+            startup.skip("passages")
+        await loop.run_in_executor(startup_executor, startup.run, "warmup", warm_up)
+
+@app.on_event("startup")
+async def start_background_loading():
+    # Keep a reference so the task isn't garbage collected while it runs
+    app.state.startup_task = asyncio.create_task(load_components())
+
+def is_ready():
+    # The passage cache and warmup are optimizations, their failure is
+    # reported but doesn't hold back traffic
+    return startup.is_ready("index", "reader") and all(
+        startup.status(name) in ("ready", "failed", "skipped") for name in ("passages", "warmup")
+    )
+
+def build_filters(author, date_from, date_to):
+    """Metadata filters from the author/from/to query parameters, None if none are set"""
+    filters = {}
+    if author:
+        filters["author"] = author
+    date_range = {}
+    for operator, value in (("$gte", date_from), ("$lte", date_to)):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD")
+            date_range[operator] = value
+    if date_range:
+        filters["publishDate"] = date_range
+    if filters and not hasattr(retriever, "filter_documents"):
+        raise HTTPException(status_code=400, detail="author/from/to filters need RETRIEVER_BACKEND=sparse")
+    return filters or None
+
+def filters_key(filters):
+    """Hashable form of build_filters() output for cache keys"""
+    if not filters:
+        return None
+    date_range = filters.get("publishDate", {})
+    return (filters.get("author", "").lower(), date_range.get("$gte"), date_range.get("$lte"))
+
+def require_ready(*components):
+    if not startup.is_ready(*components):
+        raise HTTPException(
+            status_code=503,
+            detail="Service is still starting up",
+            headers={"Retry-After": "5"}
+        )
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the index and reader are loaded and warmed up"""
+    ready = is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "components": startup.report()}
+    )
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the /search and /query result cache"""
+    return query_cache.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics of this worker process"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+def require_profile_token(token: Optional[str]):
+    # Without a token the profiles are only reachable through PROFILE_DIR
+    if not token_matches(token, profile_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/profiles")
+async def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """Recent request profiles, newest first; needs `X-Profile-Token`"""
+    require_profile_token(x_profile_token)
+    return {"profiles": profile_store.list()}
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """One profile as folded stacks, for flamegraph.pl or speedscope"""
+    require_profile_token(x_profile_token)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["folded"])
+
+@app.get("/inference/stats")
+async def inference_stats():
+    """Queue depth, wait times and rejections of the /query inference executor"""
+    return inference_executor.stats()
+
+def article_summary(doc):
+    # Documents restored from a snapshot taken before summaries were stored
+    summary = doc.meta.get("summary")
+    return summary if summary is not None else make_summary(doc.content)
+
+# Fields /articles can return, each read from the stored document
+ARTICLE_FIELDS = {
+    "id": lambda doc: doc.id,
+    "title": lambda doc: doc.meta.get("title", "Untitled"),
+    "summary": article_summary,
+    "content": lambda doc: doc.content[:2000],  # Increased from 500 to 2000 characters
+    "publishDate": lambda doc: doc.meta.get("publishDate", None),
+    "author": lambda doc: doc.meta.get("author", "Unknown")
+}
+ARTICLE_DEFAULT_FIELDS = ("id", "title", "content", "publishDate", "author")
+SEARCH_FIELDS = ("id", "title", "summary", "preview", "highlights", "score", "publishDate", "author")
+SEARCH_DEFAULT_FIELDS = ("id", "title", "preview", "highlights", "score", "publishDate", "author")
+
+def select_fields(fields, allowed, default):
+    """parse_fields() with unknown fields reported as a 400"""
+    try:
+        return parse_fields(fields, allowed, default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_article_order(build: bool = True):
+    """Newest-first order of the store contents and the sparse index it was built from
+
+    Rebuilt only when the store changes, not on every /articles request.
+    With `build=False` an out of date order isn't rebuilt, None is returned.
+    """
+    global article_order
+    version = store_version()
+    if article_order is None or article_order[0] != version:
+        if not build:
+            return None
+        bm25_index = retriever.get_index() if hasattr(retriever, "get_index") else None
+        if bm25_index is not None:
+            # Same document list as the index, so filter bitmaps index into it
+            documents = bm25_index.documents
+        else:
+            documents = document_store.get_all_documents()
+        article_order = (version, ArticleOrder(documents), bm25_index)
+    return article_order[1], article_order[2]
+
+@app.get("/articles", response_model=ArticlePage)
+async def get_articles(
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = None,
+    author: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Articles newest first
+
+    Pass the returned `next_cursor` as `cursor` to get the next page; deep
+    pages cost the same as the first. `page` still works without a cursor.
+    `fields=id,title,summary` returns only those fields of each article.
+    """
+    require_ready("index")
+    filters = build_filters(author, date_from, to)
+    fields = select_fields(fields, ARTICLE_FIELDS, ARTICLE_DEFAULT_FIELDS)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not isinstance(after[0], int):
+            raise HTTPException(status_code=400, detail=f"Invalid cursor '{cursor}'")
     
-    results = [{
-        "id": doc.id,
-        "title": doc.meta.get("title", "Untitled"),
-        "content": doc.content[:2000],  # Increased from 500 to 2000 characters
-        "publishDate": doc.meta.get("publishDate", None),
-        "author": doc.meta.get("author", "Unknown")
-    } for doc in paginated_docs]
+    # Built at index load time; if the store changed since, the rebuild parses
+    # every date, so it runs off the event loop
+    order, bm25_index = get_article_order(build=False) or await run_in_threadpool(get_article_order)
+    allowed = None
+    if filters:
+        # Bitmap lookups instead of scanning every document's meta
+        allowed = bm25_index.metadata.select(filters).to_array() if bm25_index is not None else []
+    paginated_docs, total, next_key = order.page(limit, offset=(page - 1) * limit, after=after, allowed=allowed)
     
-    return {
+    results = [{field: ARTICLE_FIELDS[field](doc) for field in fields} for doc in paginated_docs]
+    
+    return FastJSONResponse({
         "results": results,
-        "total": len(documents),
-        "page": page,
-        "limit": limit
-    }
+        "total": total,
+        "page": page if after is None else None,
+        "limit": limit,
+        "next_cursor": encode_cursor(*next_key) if next_key else None
+    }, headers={"Cache-Control": cache_control(article_list_max_age)})
+
+@app.get("/articles/{article_id}", response_model=Article)
+async def get_article(article_id: str, if_none_match: Optional[str] = Header(None)):
+    """One full article
 
-@app.get("/articles/{article_id}")
-async def get_article(article_id: str):
+    The ETag is the article file's content hash from ingest, so a matching
+    If-None-Match gets a 304 without the article being read.
+    """
+    require_ready("index")
+    headers = {"Cache-Control": cache_control(article_max_age)}
+    content_hash = article_etags.get(article_id)
+    if content_hash is not None:
+        headers["ETag"] = make_etag(content_hash)
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    
     document = document_store.get_document_by_id(article_id)
     if document is None:
         raise HTTPException(status_code=404, detail="Article not found")
+    if content_hash is None:
+        # Not from the archive manifest, hash what is stored instead
+        headers["ETag"] = make_etag(compute_content_hash(document.content))
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
     
-    return {
+    return FastJSONResponse({
         "id": document.id,
         "title": document.meta.get("title", "Untitled"),
         "content": document.content,
         "publishDate": document.meta.get("publishDate", None),
         "author": document.meta.get("author", "Unknown")
-    }
+    }, headers=headers)
+
+def build_preview(doc, query: str):
+    """Context around the query terms in a document and the matches in it"""
+    # The sparse retriever cuts the window from its positional index
+    window = retriever.snippet(doc.id, query) if hasattr(retriever, "snippet") else None
+    if window is not None:
+        start, end, highlights = window
+        return doc.content[start:end].lower(), highlights
+    
+    # Find the position of the query terms in the content for context
+    content = doc.content.lower()
+    query_terms = query.lower().split()
+    
+    # Find the first occurrence of any query term
+    positions = []
+    for term in query_terms:
+        pos = content.find(term)
+        if pos != -1:
+            positions.append(pos)
+    
+    # Get context around the first match
+    if positions:
+        start_pos = min(positions)
+        # Get some context before and after the match
+        start = max(0, start_pos - 100)
+        end = min(len(content), start_pos + 300)
+        context = content[start:end]
+    else:
+        # If no direct match, show the beginning of the content
+        context = content[:400]
+    return context, []
+
+def find_articles(query: str, syntax: str = "plain", filters=None):
+    if syntax == "boolean":
+        # Phrases, AND/OR/NOT and proximity, evaluated on the postings
+        with time_stage("retrieval"):
+            retrieved_docs = retriever.retrieve_boolean(query, filters=filters, top_k=5)
+        preview_query = " ".join(positive_tokens(parse_query(query, document_store.bm25_tokenization_regex)))
+    else:
+        # Use BM25 retriever to find relevant documents
+        with time_stage("retrieval"):
+            retrieved_docs = retriever.retrieve(
+                query=query,
+                filters=filters,
+                top_k=5,  # Retrieve top 5 most relevant documents
+            )
+        preview_query = query
+    return format_search_results(retrieved_docs, preview_query)
+
+def format_search_results(retrieved_docs, preview_query: str):
+    """/search result entries for retrieved documents"""
+    search_results = []
+    for doc in retrieved_docs:
+        context, highlights = build_preview(doc, preview_query)
+        search_results.append({
+            "id": doc.id,
+            "title": doc.meta.get("title", "Untitled"),
+            "summary": article_summary(doc),
+            "preview": f"...{context}...",
+            # [start, end] of query term matches within preview, past its leading "..."
+            "highlights": [[start + 3, end + 3] for start, end in highlights],
+            "score": doc.score,
+            "publishDate": doc.meta.get("publishDate", None),
+            "author": doc.meta.get("author", "Unknown")
+        })
+    
+    return search_results
 
 # Add text search functionality
-@app.get("/search")
-def search_articles(query: str):
+@app.get("/search", response_model=SearchResponse)
+def search_articles(
+    query: str,
+    syntax: str = Query("plain", regex="^(plain|boolean)$"),
+    author: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    require_ready("index")
+    filters = build_filters(author, date_from, to)
+    fields = select_fields(fields, SEARCH_FIELDS, SEARCH_DEFAULT_FIELDS)
+    if syntax == "boolean" and not hasattr(retriever, "retrieve_boolean"):
+        raise HTTPException(status_code=400, detail="syntax=boolean needs RETRIEVER_BACKEND=sparse")
     try:
-        print(f"Received search query: {query}")
+        log.debug("search_query", query=query, syntax=syntax)
+        # Operators are case sensitive in boolean syntax, only collapse whitespace there
+        key = normalize_query(query) if syntax == "plain" else " ".join(query.split())
+        search_results = query_cache.get_or_compute(
+            ("search", syntax, key, filters_key(filters)), lambda: find_articles(query, syntax, filters)
+        )
         
-        # Use BM25 retriever to find relevant documents
+        return FastJSONResponse({
+            # The cache holds every field, each response keeps the requested ones
+            "results": [{field: result[field] for field in fields} for result in search_results],
+            "total": len(search_results),
+            "query": query
+        })
+            
+    except QuerySyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+    except Exception as e:
+        log.exception("search_failed", query=query)
+        return FastJSONResponse({"error": str(e)})
+
+def build_answer(query: str, filters=None):
+    # Retrieve more documents and get multiple answer candidates
+    result = answer_question(query, retriever_top_k=5, reader_top_k=3, filters=filters)
+    
+    if log.enabled("debug"):
+        log.debug("qa_result", query=query, documents=len(result["documents"]),
+                  answers=[(answer.answer, round(float(answer.score), 4)) for answer in result["answers"]])
+    return format_answer(query, result["answers"], filters)
+
+def format_answer(query: str, answers, filters=None):
+    """/query response body for the reader's best answers"""
+    if answers:
+        # Get all answers and combine them for a more comprehensive response
+        main_answer = answers[0]
+        
+        # Combine the answers into a more detailed response
+        combined_answer = main_answer.answer
+        if len(answers) > 1:
+            combined_answer += "\n\nAdditional context:\n" + "\n".join(
+                [f"• {ans.answer}" for ans in answers[1:]]
+            )
+        
+        # Get the full document for context
+        doc = document_store.get_document_by_id(main_answer.document_ids[0])
+        
+        return {
+            "answer": combined_answer,
+            "confidence": main_answer.score,
+            "context": main_answer.context,
+            "source": {
+                "id": doc.id if doc else None,
+                "title": doc.meta.get("title", "Untitled") if doc else None,
+                "author": doc.meta.get("author", "Unknown") if doc else None,
+                "publishDate": doc.meta.get("publishDate", None) if doc else None
+            }
+        }
+    else:
+        # If no specific answer found, return relevant documents
         retrieved_docs = retriever.retrieve(
             query=query,
-            top_k=5,  # Retrieve top 5 most relevant documents
+            filters=filters,
+            top_k=3
         )
         
-        # Format the results
-        search_results = []
+        # Create a summary from the retrieved documents
+        relevant_excerpts = []
         for doc in retrieved_docs:
-            # Find the position of the query terms in the content for context
-            content = doc.content.lower()
-            query_terms = query.lower().split()
-            
-            # Find the first occurrence of any query term
-            positions = []
-            for term in query_terms:
-                pos = content.find(term)
-                if pos != -1:
-                    positions.append(pos)
-            
-            # Get context around the first match
-            if positions:
-                start_pos = min(positions)
-                # Get some context before and after the match
-                start = max(0, start_pos - 100)
-                end = min(len(content), start_pos + 300)
-                context = content[start:end]
-            else:
-                # If no direct match, show the beginning of the content
-                context = content[:400]
-            
-            search_results.append({
-                "id": doc.id,
+            # Get a larger preview of each document
+            preview = doc.content[:1000]
+            relevant_excerpts.append({
                 "title": doc.meta.get("title", "Untitled"),
-                "preview": f"...{context}...",
-                "score": doc.score,
-                "publishDate": doc.meta.get("publishDate", None),
-                "author": doc.meta.get("author", "Unknown")
+                "excerpt": preview,
+                "author": doc.meta.get("author", "Unknown"),
+                "date": doc.meta.get("publishDate", None)
             })
         
         return {
-            "results": search_results,
-            "total": len(search_results),
-            "query": query
+            "answer": "I couldn't find a specific answer, but here are relevant passages from the articles:",
+            "confidence": 0,
+            "context": "\n\n".join([f"From '{exc['title']}':\n{exc['excerpt']}" for exc in relevant_excerpts]),
+            "source": {
+                "id": retrieved_docs[0].id if retrieved_docs else None,
+                "title": retrieved_docs[0].meta.get("title", "Untitled") if retrieved_docs else None,
+                "author": retrieved_docs[0].meta.get("author", "Unknown") if retrieved_docs else None,
+                "publishDate": retrieved_docs[0].meta.get("publishDate", None) if retrieved_docs else None
+            } if retrieved_docs else None,
+            "additional_sources": relevant_excerpts[1:] if len(relevant_excerpts) > 1 else []
         }
-            
-    except Exception as e:
-        print(f"Error in search: {str(e)}")
-        return {"error": str(e)}
 
 # AI-powered question answering
-@app.get("/query")
-def query_pipeline(query: str):
+def submit_claimed(key, future, fn, *args):
+    """Compute a claimed cache key on an inference worker, 503 if the queue is full
+
+    A shed leader fails its claim, so requests waiting on it are shed too
+    instead of waiting forever.
+    """
     try:
-        print(f"Received QA query: {query}")
-        print(f"Document store has {document_store.get_document_count()} documents")
-        
-        # Run the full QA pipeline with corrected parameters
-        result = pipeline.run(
-            query=query,
-            params={
-                "Retriever": {
-                    "top_k": 5  # Retrieve more documents
-                },
-                "Reader": {
-                    "top_k": 3  # Get multiple answer candidates
-                }
-            }
-        )
-        
-        print("Pipeline result:", result)
-        print("Answers:", result.get("answers", []))
-        
-        if result["answers"]:
-            # Get all answers and combine them for a more comprehensive response
-            answers = result["answers"]
-            main_answer = answers[0]
-            
-            # Combine the answers into a more detailed response
-            combined_answer = main_answer.answer
-            if len(answers) > 1:
-                combined_answer += "\n\nAdditional context:\n" + "\n".join(
-                    [f"• {ans.answer}" for ans in answers[1:]]
-                )
-            
-            # Get the full document for context
-            doc = document_store.get_document_by_id(main_answer.document_ids[0])
-            
-            return {
-                "answer": combined_answer,
-                "confidence": main_answer.score,
-                "context": main_answer.context,
-                "source": {
-                    "id": doc.id if doc else None,
-                    "title": doc.meta.get("title", "Untitled") if doc else None,
-                    "author": doc.meta.get("author", "Unknown") if doc else None,
-                    "publishDate": doc.meta.get("publishDate", None) if doc else None
-                }
-            }
-        else:
-            # If no specific answer found, return relevant documents
-            retrieved_docs = retriever.retrieve(
-                query=query,
-                top_k=3
-            )
-            
-            # Create a summary from the retrieved documents
-            relevant_excerpts = []
-            for doc in retrieved_docs:
-                # Get a larger preview of each document
-                preview = doc.content[:1000]
-                relevant_excerpts.append({
-                    "title": doc.meta.get("title", "Untitled"),
-                    "excerpt": preview,
-                    "author": doc.meta.get("author", "Unknown"),
-                    "date": doc.meta.get("publishDate", None)
-                })
-            
-            return {
-                "answer": "I couldn't find a specific answer, but here are relevant passages from the articles:",
-                "confidence": 0,
-                "context": "\n\n".join([f"From '{exc['title']}':\n{exc['excerpt']}" for exc in relevant_excerpts]),
-                "source": {
-                    "id": retrieved_docs[0].id if retrieved_docs else None,
-                    "title": retrieved_docs[0].meta.get("title", "Untitled") if retrieved_docs else None,
-                    "author": retrieved_docs[0].meta.get("author", "Unknown") if retrieved_docs else None,
-                    "publishDate": retrieved_docs[0].meta.get("publishDate", None) if retrieved_docs else None
-                } if retrieved_docs else None,
-                "additional_sources": relevant_excerpts[1:] if len(relevant_excerpts) > 1 else []
-            }
-            
+        inference_executor.submit(query_cache.finish, key, future, lambda: fn(*args))
+    except InferenceQueueFull as e:
+        query_cache.fail(key, future, e)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": inference_retry_after})
+
+@app.get("/query", response_model=QueryResponse)
+async def query_pipeline(
+    query: str,
+    author: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None
+):
+    require_ready("index", "reader")
+    filters = build_filters(author, date_from, to)
+    key = ("query", normalize_query(query), filters_key(filters))
+    # Cache hits don't need an inference worker
+    cached = query_cache.get(key)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    # Nor does waiting for the same question already being answered, only
+    # the leader takes an inference slot
+    future, leader = query_cache.claim(key)
+    if leader:
+        log.debug("qa_query", query=query)
+        submit_claimed(key, future, build_answer, query, filters)
+    try:
+        return FastJSONResponse(await wait_claim(future))
+    except InferenceQueueFull as e:
+        # The leader we were waiting on was shed
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": inference_retry_after})
     except Exception as e:
-        print(f"Error in QA pipeline: {str(e)}")
-        print(f"Full error details:", e.__class__.__name__)
-        import traceback
-        print(traceback.format_exc())
-        return {
+        log.exception("qa_failed", query=query)
+        return FastJSONResponse({
             "answer": "Sorry, I encountered an error while processing your question.",
             "confidence": 0,
             "context": str(e),
             "error": str(e)
-        }
+        })
+
+def encode_event(event: str, data, stream_format: str):
+    if stream_format == "ndjson":
+        return json.dumps({"event": event, **data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def source_event(doc):
+    return {
+        "id": doc.id,
+        "title": doc.meta.get("title", "Untitled"),
+        "author": doc.meta.get("author", "Unknown"),
+        "publishDate": doc.meta.get("publishDate", None),
+        "score": doc.score
+    }
+
+def answer_event(answer):
+    return {
+        "answer": answer.answer,
+        "score": answer.score,
+        "context": answer.context,
+        "document_id": answer.document_ids[0] if answer.document_ids else None
+    }
+
+async def stream_answer(query: str, filters, stream_format: str, cache_key, claim, retrieval):
+    """Events of one streamed /query: sources, then answers per document, then the full result
+
+    The stream leads `claim`: requests for the same question wait on it and
+    get its final result. A client disconnect cancels the step being
+    awaited; a step still queued is dropped and gives its inference slot
+    back, a running one finishes and its result is discarded.
+    """
+    started = time.perf_counter()
+    error = None
+    
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000, 3)
+    
+    try:
+        documents = await asyncio.wrap_future(retrieval)
+        yield encode_event("sources", {"sources": [source_event(doc) for doc in documents], "elapsed_ms": elapsed_ms()},
+                           stream_format)
+        
+        answers = []
+        # Best retrieved document first; each one still goes through the batcher,
+        # so concurrent streams share forward passes
+        for doc in documents:
+            result = await asyncio.wrap_future(
+                inference_executor.submit(reader_batcher.predict, query=query, documents=[doc], top_k=3)
+            )
+            answers.extend(result["answers"])
+            yield encode_event("answers", {
+                "document_id": doc.id,
+                "answers": [answer_event(answer) for answer in result["answers"]],
+                "elapsed_ms": elapsed_ms()
+            }, stream_format)
+        
+        # Reader scores don't depend on the other documents, so this is what /query returns
+        answers.sort(key=lambda answer: answer.score, reverse=True)
+        body = await asyncio.wrap_future(inference_executor.submit(format_answer, query, answers[:3], filters))
+        query_cache.complete(cache_key, claim, body)
+        yield encode_event("done", {**body, "elapsed_ms": elapsed_ms()}, stream_format)
+    except Exception as e:
+        error = e
+        log.exception("qa_stream_failed", query=query)
+        yield encode_event("error", {"error": str(e), "elapsed_ms": elapsed_ms()}, stream_format)
+    finally:
+        if not claim.done():
+            # Failed or the client went away, don't leave the waiters hanging
+            query_cache.fail(cache_key, claim, error or RuntimeError("The streamed query was cancelled"))
+
+async def stream_claimed(future, stream_format: str):
+    """The "done" event of a question another request is answering"""
+    started = time.perf_counter()
+    try:
+        body = await wait_claim(future)
+        event, data = "done", body
+    except Exception as e:
+        event, data = "error", {"error": str(e)}
+    yield encode_event(event, {**data, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}, stream_format)
+
+@app.get("/query/stream")
+async def query_stream(
+    query: str,
+    format: str = Query("sse", regex="^(sse|ndjson)$"),
+    author: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None
+):
+    """/query as a stream of events, the retrieved sources first
+
+    Server-sent events by default, `format=ndjson` for one JSON object per
+    line. Every event carries `elapsed_ms` since the request started.
+    """
+    require_ready("index", "reader")
+    filters = build_filters(author, date_from, to)
+    key = ("query", normalize_query(query), filters_key(filters))
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    
+    cached = query_cache.get(key)
+    if cached is not None:
+        return StreamingResponse(iter([encode_event("done", {**cached, "elapsed_ms": 0.0}, format)]), media_type=media_type)
+    claim, leader = query_cache.claim(key)
+    if not leader:
+        # Already being answered, wait for that instead of taking an inference slot
+        return StreamingResponse(stream_claimed(claim, format), media_type=media_type,
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    try:
+        log.debug("qa_stream_query", query=query)
+        # Submitted before the response starts, so overload is still a plain 503
+        retrieval = inference_executor.submit(retrieve_passages, query, 5, filters)
+    except InferenceQueueFull as e:
+        query_cache.fail(key, claim, e)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": inference_retry_after})
+    return StreamingResponse(
+        stream_answer(query, filters, format, key, claim, retrieval),
+        media_type=media_type,
+        # Keep proxies from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def check_batch(queries: List[str]):
+    if not queries or len(queries) > batch_max_queries:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {batch_max_queries} queries")
+
+def batch_item(query: str, result=None, error: Optional[str] = None):
+    return {"query": query, "error": error} if error is not None else {"query": query, "result": result}
+
+def search_batch(queries: List[str], syntax: str, filters):
+    """find_articles() of many queries, {index: results or exception}
+
+    Plain queries are retrieved in one retrieve_batch() call.
+    """
+    if syntax == "boolean":
+        outcomes = {}
+        for index, query in enumerate(queries):
+            try:
+                outcomes[index] = find_articles(query, syntax, filters)
+            except Exception as e:
+                outcomes[index] = e
+        return outcomes
+    with time_stage("retrieval"):
+        retrieved = retriever.retrieve_batch(queries, filters=filters, top_k=5)
+    return {index: format_search_results(docs, query) for index, (query, docs) in enumerate(zip(queries, retrieved))}
+
+@app.post("/search/batch", response_model=SearchBatchResponse)
+def search_articles_batch(request: SearchBatchRequest):
+    """/search for many queries, results in input order
+
+    An item that fails carries an `error` instead of a `result`, the rest
+    of the batch is unaffected.
+    """
+    require_ready("index")
+    check_batch(request.queries)
+    filters = build_filters(request.author, request.date_from, request.to)
+    fields = select_fields(request.fields, SEARCH_FIELDS, SEARCH_DEFAULT_FIELDS)
+    if request.syntax == "boolean" and not hasattr(retriever, "retrieve_boolean"):
+        raise HTTPException(status_code=400, detail="syntax=boolean needs RETRIEVER_BACKEND=sparse")
+    
+    def key(query):
+        normalized = normalize_query(query) if request.syntax == "plain" else " ".join(query.split())
+        return ("search", request.syntax, normalized, filters_key(filters))
+    
+    outcomes = {}
+    pending = []
+    for index, query in enumerate(request.queries):
+        if not query.strip():
+            outcomes[index] = ValueError("Empty query")
+            continue
+        cached = query_cache.get(key(query))
+        if cached is not None:
+            outcomes[index] = cached
+        else:
+            pending.append(index)
+    if pending:
+        computed = search_batch([request.queries[index] for index in pending], request.syntax, filters)
+        for position, index in enumerate(pending):
+            outcome = computed[position]
+            if not isinstance(outcome, Exception):
+                query_cache.get_or_compute(key(request.queries[index]), lambda: outcome)
+            outcomes[index] = outcome
+    
+    results = []
+    for index, query in enumerate(request.queries):
+        outcome = outcomes[index]
+        if isinstance(outcome, Exception):
+            message = f"Invalid query: {outcome}" if isinstance(outcome, QuerySyntaxError) else str(outcome)
+            results.append(batch_item(query, error=message))
+        else:
+            results.append(batch_item(query, [{field: result[field] for field in fields} for result in outcome]))
+    return FastJSONResponse({"results": results, "total": len(results)})
+
+def answer_batch(queries: List[str], filters):
+    """format_answer() bodies of many questions, {index: body or exception}
+
+    Retrieval runs as one retrieve_batch() call and the reader reads every
+    question's passages in one predict_batch() call, so windows from all
+    questions share padded batches. If that call fails, questions are
+    retried one by one so only the ones that fail again report an error.
+    """
+    with time_stage("retrieval"):
+        retrieved = retriever.retrieve_batch(queries, filters=filters, top_k=5)
+    documents = [[doc for doc in docs if doc.content.strip()] for docs in retrieved]
+    readable = [index for index, docs in enumerate(documents) if docs]
+    answers = {index: [] for index in range(len(queries))}
+    outcomes = {}
+    if readable:
+        try:
+            with time_stage("reader"):
+                result = reader.predict_batch(
+                    queries=[queries[index] for index in readable],
+                    documents=[documents[index] for index in readable],
+                    top_k=3
+                )
+            answers.update(zip(readable, result["answers"]))
+        except Exception as e:
+            log.warning("reader_batch_failed", queries=len(readable), error=str(e))
+            for index in readable:
+                try:
+                    answers[index] = reader.predict(query=queries[index], documents=documents[index], top_k=3)["answers"]
+                except Exception as e:
+                    outcomes[index] = e
+    for index, query in enumerate(queries):
+        if index not in outcomes:
+            try:
+                outcomes[index] = format_answer(query, answers[index], filters)
+            except Exception as e:
+                outcomes[index] = e
+    return outcomes
+
+def answer_claimed(queries: List[str], filters, claimed):
+    """answer_batch() resolving each question's (key, claim) with its outcome
+
+    Runs on the inference worker, so the claims resolve even if the batch
+    request that made them goes away.
+    """
+    try:
+        computed = answer_batch(queries, filters)
+    except Exception as e:
+        computed = {position: e for position in range(len(queries))}
+    for position, (claim_key, claim) in enumerate(claimed):
+        outcome = computed[position]
+        if isinstance(outcome, Exception):
+            query_cache.fail(claim_key, claim, outcome)
+        else:
+            query_cache.complete(claim_key, claim, outcome)
+
+@app.post("/query/batch", response_model=QueryBatchResponse)
+async def query_pipeline_batch(request: BatchRequest):
+    """/query for many questions, results in input order
+
+    An item that fails carries an `error` instead of a `result`, the rest
+    of the batch is unaffected. The whole batch takes one inference worker.
+    """
+    require_ready("index", "reader")
+    check_batch(request.queries)
+    filters = build_filters(request.author, request.date_from, request.to)
+    
+    def key(query):
+        return ("query", normalize_query(query), filters_key(filters))
+    
+    outcomes = {}
+    # Questions this batch answers (index, claim) and ones it waits on (index, future)
+    pending = []
+    waiting = []
+    for index, query in enumerate(request.queries):
+        if not query.strip():
+            outcomes[index] = ValueError("Empty query")
+            continue
+        cached = query_cache.get(key(query))
+        if cached is not None:
+            outcomes[index] = cached
+            continue
+        # Repeats within the batch and questions other requests are answering are waited on
+        claim, leader = query_cache.claim(key(query))
+        (pending if leader else waiting).append((index, claim))
+    if pending:
+        claimed = [(key(request.queries[index]), claim) for index, claim in pending]
+        try:
+            inference_executor.submit(
+                answer_claimed, [request.queries[index] for index, _ in pending], filters, claimed
+            )
+        except InferenceQueueFull as e:
+            for claim_key, claim in claimed:
+                query_cache.fail(claim_key, claim, e)
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": inference_retry_after})
+        waiting = pending + waiting
+    for index, claim in waiting:
+        try:
+            outcomes[index] = await wait_claim(claim)
+        except Exception as e:
+            outcomes[index] = e
+    
+    results = [
+        batch_item(query, error=str(outcomes[index])) if isinstance(outcomes[index], Exception)
+        else batch_item(query, outcomes[index])
+        for index, query in enumerate(request.queries)
+    ]
+    return FastJSONResponse({"results": results, "total": len(results)})
 
 if __name__ == "__main__":
     # Initialize the model if not already downloaded
     if not os.path.exists(os.path.join(model_dir, "config.json")):
-        print("Downloading and saving the model...")
+        log.info("model_downloading", path=model_dir)
         tokenizer = DistilBertTokenizer.from_pretrained("distilbert-base-uncased-distilled-squad")
         model = DistilBertForQuestionAnswering.from_pretrained("distilbert-base-uncased-distilled-squad")
         tokenizer.save_pretrained(model_dir)
         model.save_pretrained(model_dir)
     else:
-        print("Loading the model from local directory...")
+        log.info("model_loading", path=model_dir)
         tokenizer = DistilBertTokenizer.from_pretrained(model_dir)
         model = DistilBertForQuestionAnswering.from_pretrained(model_dir)
     
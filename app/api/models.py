@@ -0,0 +1,132 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+# Response schemas. Endpoints return FastJSONResponse payloads directly, so
+# these document the API (OpenAPI) without validating every response.
+# Fields a `fields=` projection can leave out are Optional.
+
+class ArticleListItem(BaseModel):
+    id: Optional[str] = None
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    content: Optional[str] = None
+    publishDate: Optional[str] = None
+    author: Optional[str] = None
+
+class ArticlePage(BaseModel):
+    results: List[ArticleListItem]
+    total: int
+    page: Optional[int] = None
+    limit: int
+    next_cursor: Optional[str] = None
+
+class Article(BaseModel):
+    id: str
+    title: str
+    content: str
+    publishDate: Optional[str] = None
+    author: str
+
+class SearchResult(BaseModel):
+    id: Optional[str] = None
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    preview: Optional[str] = None
+    highlights: Optional[List[List[int]]] = None
+    score: Optional[float] = None
+    publishDate: Optional[str] = None
+    author: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    total: int
+    query: str
+
+class Source(BaseModel):
+    id: Optional[str] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    publishDate: Optional[str] = None
+
+class Excerpt(BaseModel):
+    title: str
+    excerpt: str
+    author: str
+    date: Optional[str] = None
+
+class QueryResponse(BaseModel):
+    answer: str
+    confidence: float
+    context: Optional[str] = None
+    source: Optional[Source] = None
+    additional_sources: Optional[List[Excerpt]] = None
+    error: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    queries: List[str]
+    author: Optional[str] = None
+    date_from: Optional[str] = Field(None, alias="from")
+    to: Optional[str] = None
+
+class SearchBatchRequest(BatchRequest):
+    syntax: str = Field("plain", regex="^(plain|boolean)$")
+    fields: Optional[str] = None
+
+class SearchBatchItem(BaseModel):
+    query: str
+    result: Optional[List[SearchResult]] = None
+    error: Optional[str] = None
+
+class SearchBatchResponse(BaseModel):
+    results: List[SearchBatchItem]
+    total: int
+
+class QueryBatchItem(BaseModel):
+    query: str
+    result: Optional[QueryResponse] = None
+    error: Optional[str] = None
+
+class QueryBatchResponse(BaseModel):
+    results: List[QueryBatchItem]
+    total: int
+
+# app/main.py returns stored MongoDB articles
+
+class StoredArticle(BaseModel):
+    id: str = Field(..., alias="_id")
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    content: Optional[str] = None
+    author: Optional[str] = None
+    publish_date: Optional[datetime] = None
+    filename: Optional[str] = None
+    content_hash: Optional[str] = None
+    last_updated: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    score: Optional[float] = None
+
+class StoredArticlePage(BaseModel):
+    total: int
+    page: Optional[int] = None
+    limit: int
+    articles: List[StoredArticle]
+    next_cursor: Optional[str] = None
+
+class StoredSearchResponse(BaseModel):
+    results: List[StoredArticle]
+    count: int
+    query: str
+
+class StoredSource(BaseModel):
+    id: str
+    title: str
+    author: str
+    publish_date: Optional[datetime] = None
+
+class StoredQueryResponse(BaseModel):
+    answer: str
+    confidence: float
+    context: Optional[str] = None
+    source: Optional[StoredSource] = None
@@ -1,12 +1,26 @@
 from fastapi import FastAPI, Query, HTTPException
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
+from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+from typing import Optional
+import asyncio
 import os
 from dotenv import load_dotenv
+from app.utils.pagination_utils import encode_cursor, decode_cursor
+from app.utils.projection_utils import parse_fields
+from app.utils.json_utils import FastJSONResponse
+from app.utils.http_cache_utils import cache_control
+from app.utils.log_utils import configure_logging
+from app.api.models import StoredArticlePage, StoredQueryResponse, StoredSearchResponse
+from app.services.article_store import ArticleStore, ArticleStoreTimeout, create_client
+from app.services.compression_middleware import CompressionMiddleware
+from app.services.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
 
 # Load environment variables
 load_dotenv()
+configure_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -23,11 +37,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# brotli/gzip for responses of COMPRESSION_MIN_SIZE bytes or more
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("GZIP_LEVEL", "5")),
+    brotli_quality=int(os.getenv("BROTLI_QUALITY", "5"))
+)
+# Outermost, so request latencies include compression
+app.add_middleware(MetricsMiddleware)
+ARTICLE_LIST_MAX_AGE = int(os.getenv("ARTICLE_LIST_MAX_AGE", "60"))  # Cache-Control of /articles
+
+# MongoDB connection, opened on startup so the async client binds to the server's event loop
+client = None
+store = None
+
+@app.on_event("startup")
+async def connect_mongodb():
+    global client, store
+    client = create_client(
+        os.getenv("MONGODB_URI"),
+        max_pool_size=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        min_pool_size=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        connect_timeout_ms=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        wait_queue_timeout_ms=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+    )
+    collection = client[os.getenv("DB_NAME", "news_db")][os.getenv("COLLECTION_NAME", "articles")]
+    store = ArticleStore(collection, timeout_ms=int(os.getenv("MONGO_TIMEOUT_MS", "5000")))
+
+@app.on_event("shutdown")
+async def close_mongodb():
+    if client is not None:
+        client.close()
 
-# MongoDB connection
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client[os.getenv("DB_NAME", "news_db")]
-collection = db[os.getenv("COLLECTION_NAME", "articles")]
+def database_timeout(e: ArticleStoreTimeout):
+    return HTTPException(status_code=504, detail=str(e))
 
 # API endpoints
 @app.get("/")
@@ -35,80 +79,137 @@ async def root():
     """Health check endpoint"""
     return {"status": "ok", "message": "News API is running"}
 
-@app.get("/articles")
-async def get_articles(page: int = Query(1, ge=1), limit: int = Query(10, ge=1, le=50)):
-    """Get paginated list of articles"""
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics of this worker process"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# Stored article fields a `fields=` projection may ask for
+ARTICLE_FIELDS = ("_id", "title", "summary", "content", "author", "publish_date", "filename", "content_hash",
+                  "last_updated", "created_at")
+
+def projection(fields: Optional[str]):
+    """Mongo projection for a `fields=` parameter, None (whole documents) if it's empty"""
+    names = parse_fields(fields, ARTICLE_FIELDS, ())
+    return {name: 1 for name in names} or None
+
+# Newest first; _id breaks ties so every article has one place in the order.
+# Served by the publish_date_id_index compound index (scripts/init_db.py)
+ARTICLE_ORDER = [("publish_date", -1), ("_id", -1)]
+
+def after_cursor(cursor: str):
+    """Query matching the articles that sort after a next_cursor"""
+    publish_date, doc_id = decode_cursor(cursor)
     try:
-        skip = (page - 1) * limit
-        total = collection.count_documents({})
+        doc_id = ObjectId(doc_id)
+        publish_date = datetime.fromisoformat(publish_date) if publish_date is not None else None
+    except (InvalidId, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if publish_date is None:
+        # Undated articles sort last, only older ids of them remain
+        return {"publish_date": None, "_id": {"$lt": doc_id}}
+    return {"$or": [
+        {"publish_date": {"$lt": publish_date}},
+        {"publish_date": publish_date, "_id": {"$lt": doc_id}},
+        {"publish_date": None}
+    ]}
+
+@app.get("/articles", response_model=StoredArticlePage)
+async def get_articles(
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Get paginated list of articles
+
+    Pass the returned `next_cursor` as `cursor` to get the next page; it
+    seeks on the index instead of skipping, so deep pages cost the same as
+    the first. `page` still works without a cursor. `fields=title,summary`
+    reads and returns only those fields instead of whole articles.
+    """
+    try:
+        query = after_cursor(cursor) if cursor else {}
+        fields = projection(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # The cursor is built from the sort key, so it is read even when not asked for
+        read_fields = {**fields, "publish_date": 1} if fields else None
+        # The count (collection metadata, not a scan) and the page run concurrently;
+        # one extra article tells whether there is a next page
+        total, articles = await asyncio.gather(
+            store.count(),
+            store.find(
+                query, read_fields, sort=ARTICLE_ORDER,
+                skip=0 if cursor else (page - 1) * limit, limit=limit + 1
+            )
+        )
+        has_more = len(articles) > limit
+        articles = articles[:limit]
         
-        articles = list(collection.find({})
-                       .sort("publish_date", -1)
-                       .skip(skip)
-                       .limit(limit))
+        next_cursor = None
+        if has_more:
+            last = articles[-1]
+            publish_date = last.get("publish_date")
+            next_cursor = encode_cursor(publish_date.isoformat() if publish_date else None, str(last["_id"]))
         
-        # Convert ObjectId to string for JSON serialization
-        for article in articles:
-            article["_id"] = str(article["_id"])
+        if fields and "publish_date" not in fields:
+            for article in articles:
+                article.pop("publish_date", None)
         
-        return {
+        # ObjectIds and datetimes are encoded by FastJSONResponse, no conversion pass
+        return FastJSONResponse({
             "total": total,
-            "page": page,
+            "page": page if not cursor else None,
             "limit": limit,
-            "articles": articles
-        }
+            "articles": articles,
+            "next_cursor": next_cursor
+        }, headers={"Cache-Control": cache_control(ARTICLE_LIST_MAX_AGE)})
+    except ArticleStoreTimeout as e:
+        raise database_timeout(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/search")
-async def search_articles(query: str):
-    """Search articles by keyword"""
+@app.get("/search", response_model=StoredSearchResponse)
+async def search_articles(query: str, fields: Optional[str] = None):
+    """Search articles by keyword, `fields=` limits the fields returned"""
+    try:
+        fields = projection(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         # Text search using MongoDB
-        results = list(collection.find(
-            {"$text": {"$search": query}},
-            {"score": {"$meta": "textScore"}}
-        ).sort([("score", {"$meta": "textScore"})])
-        .limit(10))
-        
-        # Convert ObjectId to string
-        for result in results:
-            result["_id"] = str(result["_id"])
+        results = await store.text_search(query, fields, limit=10)
         
-        return {
+        return FastJSONResponse({
             "results": results,
             "count": len(results),
             "query": query
-        }
+        })
+    except ArticleStoreTimeout as e:
+        raise database_timeout(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/query")
+@app.get("/query", response_model=StoredQueryResponse)
 async def query_articles(query: str):
     """AI-powered article querying"""
     try:
         # First, find relevant documents
-        relevant_docs = list(collection.find(
-            {"$text": {"$search": query}},
-            {"score": {"$meta": "textScore"}}
-        ).sort([("score", {"$meta": "textScore"})])
-        .limit(3))
+        relevant_docs = await store.text_search(query, limit=3)
         
         if not relevant_docs:
-            return {
+            return FastJSONResponse({
                 "answer": "I couldn't find any relevant information for your query.",
                 "confidence": 0,
                 "context": None
-            }
-        
-        # Convert ObjectId to string
-        for doc in relevant_docs:
-            doc["_id"] = str(doc["_id"])
+            })
         
         # For now, return the most relevant document
         best_match = relevant_docs[0]
         
-        return {
+        return FastJSONResponse({
             "answer": best_match["content"][:500],  # First 500 characters as answer
             "confidence": best_match.get("score", 0),
             "context": best_match["content"],
@@ -118,7 +219,9 @@ async def query_articles(query: str):
                 "author": best_match.get("author", "Unknown"),
                 "publish_date": best_match.get("publish_date")
             }
-        }
+        })
+    except ArticleStoreTimeout as e:
+        raise database_timeout(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,66 @@
+from typing import List
+
+import numpy as np
+from haystack.schema import Document
+
+from app.services.bitmap_index import parse_date
+
+class ArticleOrder:
+    """Documents sorted newest first by (publish date, id) for /articles paging
+
+    A page after a cursor is found by binary search on the sorted keys, so
+    every page costs the same however deep it is. Documents without a usable
+    date sort last.
+    """
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+        num_docs = len(documents)
+        days = np.full(num_docs, -1, dtype=np.int64)
+        for position, doc in enumerate(documents):
+            day = parse_date(doc.meta.get("publishDate"))
+            if day is not None:
+                days[position] = day.toordinal()
+        ids = np.array([doc.id for doc in documents], dtype=str)
+
+        # lexsort is ascending on (day, id), reversed it is newest first
+        self.order = np.lexsort((ids, days))[::-1]
+        self.days = days[self.order]
+        # Ascending, for binary search
+        self._negated_days = -self.days
+        self.ids = ids[self.order]
+        # rank[position]: where a document sits in the newest-first order
+        self.rank = np.empty(num_docs, dtype=np.int64)
+        self.rank[self.order] = np.arange(num_docs)
+
+    def _rank_after(self, day: int, doc_id: str):
+        """Rank of the first document that sorts after (day, doc_id)"""
+        lo = int(np.searchsorted(self._negated_days, -day, side="left"))
+        hi = int(np.searchsorted(self._negated_days, -day, side="right"))
+        # Same-day ids are descending too, the ones below doc_id come after it
+        return hi - int(np.searchsorted(self.ids[lo:hi][::-1], doc_id, side="left"))
+
+    def page(self, limit: int, offset: int = 0, after=None, allowed=None):
+        """(documents, total, cursor key of the last one or None if there are no more)
+
+        `after` is a (day, id) cursor key from a previous page and takes
+        precedence over `offset`. `allowed` restricts the listing to these
+        positions in `documents`, e.g. the result of a metadata filter.
+        """
+        ranks = None if allowed is None else np.sort(self.rank[allowed])
+        total = len(self.documents) if ranks is None else len(ranks)
+        if after is not None:
+            start = self._rank_after(*after)
+            if ranks is not None:
+                start = int(np.searchsorted(ranks, start))
+        else:
+            start = offset
+        end = min(start + limit, total)
+        selected = np.arange(start, end) if ranks is None else ranks[start:end]
+
+        documents = [self.documents[position] for position in self.order[selected]]
+        next_key = None
+        if end < total and len(selected):
+            last = selected[-1]
+            next_key = (int(self.days[last]), str(self.ids[last]))
+        return documents, total, next_key
@@ -0,0 +1,71 @@
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError
+
+from app.services.metrics import time_stage
+
+class ArticleStoreTimeout(Exception):
+    pass
+
+def create_client(uri: str, max_pool_size: int = 50, min_pool_size: int = 0, connect_timeout_ms: int = 5000,
+                  wait_queue_timeout_ms: int = 2000):
+    """Motor client with a bounded connection pool
+
+    A request that can't get a pooled connection within
+    `wait_queue_timeout_ms` fails instead of queueing behind a saturated pool.
+    Create it from a running event loop (e.g. a startup handler).
+    """
+    return AsyncIOMotorClient(
+        uri,
+        maxPoolSize=max_pool_size,
+        minPoolSize=min_pool_size,
+        connectTimeoutMS=connect_timeout_ms,
+        serverSelectionTimeoutMS=connect_timeout_ms,
+        waitQueueTimeoutMS=wait_queue_timeout_ms
+    )
+
+class ArticleStore:
+    """Async reads of the articles collection
+
+    Every operation gets `timeout_ms`: the server aborts it after that long
+    (maxTimeMS) and the caller stops waiting shortly after, whichever comes
+    first raising ArticleStoreTimeout. Nothing here blocks the event loop.
+    """
+
+    def __init__(self, collection, timeout_ms: int = 5000):
+        self.collection = collection
+        self.timeout_ms = timeout_ms
+
+    async def _run(self, awaitable, name: str):
+        # A little past maxTimeMS so the server's own timeout normally fires first
+        try:
+            with time_stage(f"mongo_{name}"):
+                return await asyncio.wait_for(awaitable, timeout=self.timeout_ms / 1000 + 0.5)
+        except (asyncio.TimeoutError, ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError) as e:
+            raise ArticleStoreTimeout(f"MongoDB operation timed out after {self.timeout_ms} ms") from e
+
+    async def count(self):
+        """Article count from collection metadata, not a scan"""
+        return await self._run(self.collection.estimated_document_count(maxTimeMS=self.timeout_ms), "count")
+
+    async def find(self, query, projection=None, sort=None, skip: int = 0, limit: int = 0, operation: str = "find"):
+        """Matching documents; `operation` names the call in the mongo_* stage timings"""
+        cursor = self.collection.find(query, projection).max_time_ms(self.timeout_ms)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await self._run(cursor.to_list(length=limit or None), operation)
+
+    async def text_search(self, text: str, projection=None, limit: int = 10):
+        """Best `limit` matches of a $text search, each with its "score" """
+        return await self.find(
+            {"$text": {"$search": text}},
+            {**(projection or {}), "score": {"$meta": "textScore"}},
+            sort=[("score", {"$meta": "textScore"})],
+            limit=limit,
+            operation="text_search"
+        )
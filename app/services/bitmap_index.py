@@ -0,0 +1,199 @@
+from datetime import date, datetime
+from typing import List
+
+import numpy as np
+
+# Containers holding more positions than this are stored as bitsets
+ARRAY_CONTAINER_MAX = 4096
+
+def _to_bits(lows: np.ndarray):
+    flags = np.zeros(1 << 16, dtype=bool)
+    flags[lows] = True
+    return np.packbits(flags, bitorder="little").view(np.uint64)
+
+def _to_lows(bits: np.ndarray):
+    return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder="little")).astype(np.uint16)
+
+def _container(lows: np.ndarray):
+    return lows if len(lows) <= ARRAY_CONTAINER_MAX else _to_bits(lows)
+
+def _is_bits(container: np.ndarray):
+    return container.dtype == np.uint64
+
+def _and(a: np.ndarray, b: np.ndarray):
+    if _is_bits(a) and _is_bits(b):
+        return _container(_to_lows(a & b))
+    if _is_bits(a):
+        a, b = b, a
+    if _is_bits(b):
+        # Array against bitset: test each array member's bit
+        members = (b[a >> 6] >> (a & 63).astype(np.uint64)) & np.uint64(1)
+        return a[members.astype(bool)]
+    return np.intersect1d(a, b, assume_unique=True)
+
+def _or(a: np.ndarray, b: np.ndarray):
+    if _is_bits(a) or _is_bits(b):
+        a = a if _is_bits(a) else _to_bits(a)
+        b = b if _is_bits(b) else _to_bits(b)
+        return a | b
+    return _container(np.union1d(a, b))
+
+class Bitmap:
+    """Compressed set of document positions, roaring style
+
+    Positions are split on their high 16 bits into containers: sorted uint16
+    arrays while sparse, 65536-bit bitsets once they hold more than
+    ARRAY_CONTAINER_MAX positions.
+    """
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_sorted(cls, positions: np.ndarray):
+        positions = np.asarray(positions, dtype=np.int64)
+        highs = positions >> 16
+        keys, starts = np.unique(highs, return_index=True)
+        ends = np.append(starts[1:], len(positions))
+        return cls({
+            int(key): _container((positions[start:end] & 0xFFFF).astype(np.uint16))
+            for key, start, end in zip(keys, starts, ends)
+        })
+
+    def __and__(self, other: "Bitmap"):
+        containers = {}
+        for key in self.containers.keys() & other.containers.keys():
+            container = _and(self.containers[key], other.containers[key])
+            if len(container) and (not _is_bits(container) or container.any()):
+                containers[key] = container
+        return Bitmap(containers)
+
+    def __or__(self, other: "Bitmap"):
+        containers = dict(self.containers)
+        for key, container in other.containers.items():
+            containers[key] = _or(containers[key], container) if key in containers else container
+        return Bitmap(containers)
+
+    def __len__(self):
+        return sum(
+            int(np.unpackbits(container.view(np.uint8)).sum()) if _is_bits(container) else len(container)
+            for container in self.containers.values()
+        )
+
+    def to_array(self):
+        """Sorted positions"""
+        parts = [
+            (np.int64(key) << 16) + (_to_lows(container) if _is_bits(container) else container).astype(np.int64)
+            for key, container in sorted(self.containers.items())
+        ]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+def union(bitmaps: List[Bitmap]):
+    """Union of many bitmaps, merging each key's containers in one pass"""
+    grouped = {}
+    for bitmap in bitmaps:
+        for key, container in bitmap.containers.items():
+            grouped.setdefault(key, []).append(container)
+    containers = {}
+    for key, group in grouped.items():
+        arrays = [container for container in group if not _is_bits(container)]
+        bitsets = [container for container in group if _is_bits(container)]
+        if not bitsets and sum(len(array) for array in arrays) <= ARRAY_CONTAINER_MAX:
+            containers[key] = np.unique(np.concatenate(arrays)) if len(arrays) > 1 else arrays[0]
+            continue
+        flags = np.zeros(1 << 16, dtype=bool)
+        for array in arrays:
+            flags[array] = True
+        bits = np.packbits(flags, bitorder="little").view(np.uint64)
+        for bitset in bitsets:
+            bits = bits | bitset
+        containers[key] = _container(_to_lows(bits)) if not bitsets else bits
+    return Bitmap(containers)
+
+def parse_date(value):
+    """date of a "YYYY-MM-DD..." string (or date/datetime), None if it isn't one"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def _month(day: date):
+    return day.year * 12 + day.month - 1
+
+class MetadataIndex:
+    """Bitmap indexes over document author and publish month
+
+    Built over the same document list as the retrieval index, so bitmap
+    members are positions in that list.
+    """
+
+    def __init__(self, documents):
+        num_docs = len(documents)
+        authors = {}
+        months = {}
+        # Days since 0001-01-01, -1 when a document has no usable date
+        self.days = np.full(num_docs, -1, dtype=np.int32)
+        for position, doc in enumerate(documents):
+            author = str(doc.meta.get("author", "")).strip().lower()
+            authors.setdefault(author, []).append(position)
+            day = parse_date(doc.meta.get("publishDate"))
+            if day is not None:
+                self.days[position] = day.toordinal()
+                months.setdefault(_month(day), []).append(position)
+        self.num_docs = num_docs
+        self.authors = {author: Bitmap.from_sorted(np.array(positions)) for author, positions in authors.items()}
+        self.months = {month: Bitmap.from_sorted(np.array(positions)) for month, positions in months.items()}
+
+    def author(self, names):
+        """Documents by any of `names` (case-insensitive)"""
+        if isinstance(names, str):
+            names = [names]
+        return union([self.authors.get(name.strip().lower(), Bitmap()) for name in names])
+
+    def date_range(self, start: date = None, end: date = None):
+        """Documents published between `start` and `end`, both inclusive and optional"""
+        first = _month(start) if start else None
+        last = _month(end) if end else None
+        low = start.toordinal() if start else 0
+        high = end.toordinal() if end else np.iinfo(np.int32).max
+        parts = []
+        for month, bitmap in self.months.items():
+            if (first is not None and month < first) or (last is not None and month > last):
+                continue
+            if month == first or month == last:
+                # Boundary months are only partly in range, check the days
+                positions = bitmap.to_array()
+                days = self.days[positions]
+                bitmap = Bitmap.from_sorted(positions[(days >= low) & (days <= high)])
+            parts.append(bitmap)
+        return union(parts)
+
+    def select(self, filters):
+        """Bitmap of the documents matching Haystack-style `filters`
+
+        Supported: {"author": name | [names] | {"$in": [names]},
+        "publishDate": {"$gte": day, "$lte": day}}, conditions are ANDed.
+        """
+        result = None
+        for field, condition in filters.items():
+            if field == "author":
+                if isinstance(condition, dict):
+                    if set(condition) != {"$in"}:
+                        raise ValueError(f"Unsupported author filter: {condition}")
+                    condition = condition["$in"]
+                bitmap = self.author(condition)
+            elif field == "publishDate":
+                if not isinstance(condition, dict) or not set(condition) <= {"$gte", "$lte"}:
+                    raise ValueError(f"Unsupported publishDate filter: {condition}")
+                bounds = {operator: parse_date(value) for operator, value in condition.items()}
+                if None in bounds.values():
+                    raise ValueError(f"Unsupported publishDate filter: {condition}")
+                bitmap = self.date_range(bounds.get("$gte"), bounds.get("$lte"))
+            else:
+                raise ValueError(f"Unsupported filter field: {field}")
+            result = bitmap if result is None else result & bitmap
+        return result if result is not None else Bitmap.from_sorted(np.arange(self.num_docs))
@@ -0,0 +1,547 @@
+import copy
+import re
+import threading
+from itertools import repeat
+from typing import List, Optional
+
+import numpy as np
+from haystack.nodes.retriever.base import BaseRetriever
+from haystack.schema import Document
+from scipy.special import expit
+
+from app.services.bitmap_index import MetadataIndex
+from app.services.query_syntax import QuerySyntaxError, evaluate, intersect, parse_query, positive_tokens
+
+# Terms in more than this share of documents are only probed, never scored in full
+DENSE_TERM_FRACTION = 0.125
+
+# InMemoryDocumentStore's default bm25_tokenization_regex
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+_WORD_CHAR = re.compile(r"\w")
+_ASCII_WORD = np.array([_WORD_CHAR.match(chr(c)) is not None for c in range(128)])
+
+# Arrays of a SparseBM25Index that state() saves
+MATRIX_ARRAYS = ("indices", "weights", "indptr", "max_weights")
+OCCURRENCE_ARRAYS = ("occurrence_starts", "occurrence_ends", "occurrence_tokens", "occurrence_lo", "occurrence_hi")
+
+class SparseBM25Index:
+    """BM25 scores of a corpus held as a CSR term-document matrix
+
+    Row t holds, for every document containing term t, that term's full
+    BM25 contribution (idf times the saturated, length-normalised term
+    frequency). Scoring a query is then a sum of a few matrix rows.
+    """
+
+    def __init__(self, bm25, documents: List[Document], token_pattern=None, state=None):
+        # Built from the store's BM25Okapi object so scores match it exactly
+        # and nothing has to be re-tokenized. `state` is the state() of an
+        # index built from the same bm25 and documents, e.g. from a snapshot;
+        # its arrays are used instead of being computed again
+        self.documents = documents
+        self.doc_positions = {doc.id: position for position, doc in enumerate(documents)}
+        self.metadata = MetadataIndex(documents)
+        self.vocabulary = {term: term_id for term_id, term in enumerate(bm25.idf)}
+        self.token_pattern = token_pattern
+        if state is not None and (
+            state["num_documents"] != len(documents) or len(state["indptr"]) != len(self.vocabulary) + 1
+        ):
+            state = None
+
+        if state is not None:
+            for name in MATRIX_ARRAYS:
+                setattr(self, name, state[name])
+        else:
+            self._build_matrix(bm25)
+
+        self.occurrence_starts = None
+        # Whether nothing had to be computed beyond what `state` held
+        self.restored = state is not None
+        if token_pattern is not None:
+            if state is not None and state.get("token_pattern") == token_pattern.pattern:
+                for name in OCCURRENCE_ARRAYS:
+                    setattr(self, name, state[name])
+            else:
+                self._build_occurrences(token_pattern)
+                self.restored = False
+
+    def _build_matrix(self, bm25):
+        idf = np.array(list(bm25.idf.values()), dtype=np.float64)
+
+        doc_ids = []
+        term_ids = []
+        term_freqs = []
+        for doc_id, freqs in enumerate(bm25.doc_freqs):
+            doc_ids.extend([doc_id] * len(freqs))
+            term_ids.extend(map(self.vocabulary.__getitem__, freqs))
+            term_freqs.extend(freqs.values())
+        doc_ids = np.array(doc_ids, dtype=np.int32)
+        term_ids = np.array(term_ids, dtype=np.int64)
+        term_freqs = np.array(term_freqs, dtype=np.float64)
+
+        doc_len = np.array(bm25.doc_len, dtype=np.float64)
+        norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / bm25.avgdl) if len(doc_len) else doc_len
+        weights = idf[term_ids] * (term_freqs * (bm25.k1 + 1) / (term_freqs + norm[doc_ids]))
+
+        order = np.argsort(term_ids, kind="stable")
+        self.indices = doc_ids[order]
+        self.weights = weights[order]
+        self.indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=self.indptr[1:])
+        # Highest weight in each row, the most a term can add to any score
+        self.max_weights = (
+            np.maximum.reduceat(self.weights, self.indptr[:-1]) if len(self.weights) else np.zeros(0)
+        )
+
+    def state(self):
+        """The index's arrays, to pass back as `state` instead of recomputing them"""
+        state = {name: getattr(self, name) for name in MATRIX_ARRAYS}
+        state["num_documents"] = len(self.documents)
+        if self.occurrence_starts is not None:
+            state.update((name, getattr(self, name)) for name in OCCURRENCE_ARRAYS)
+            state["token_pattern"] = self.token_pattern.pattern
+        return state
+
+    def _build_occurrences(self, token_pattern):
+        """Positional index: character span and token number of every term occurrence
+
+        Occurrences are grouped per posting, posting p owns
+        occurrence_starts/ends/tokens[occurrence_lo[p]:occurrence_hi[p]], in
+        text order.
+        """
+        keys = []
+        spans = []
+        token_numbers = []
+        num_docs = len(self.documents)
+        for position, doc in enumerate(self.documents):
+            tokens = token_pattern.findall(doc.content.lower())
+            doc_spans = _token_spans(token_pattern, doc.content)
+            if len(tokens) != len(doc_spans):
+                # Lowercasing changed the text's shape, tokenize the spans themselves
+                tokens = [doc.content[start:end].lower() for start, end in doc_spans]
+            term_ids = np.fromiter(
+                map(self.vocabulary.get, tokens, repeat(-1)), dtype=np.int64, count=len(tokens)
+            )
+            known = term_ids >= 0
+            keys.append(term_ids[known] * num_docs + position)
+            spans.append(doc_spans[known])
+            token_numbers.append(np.flatnonzero(known).astype(np.int32))
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        spans = np.concatenate(spans) if spans else np.zeros((0, 2), dtype=np.int32)
+        token_numbers = np.concatenate(token_numbers) if token_numbers else np.zeros(0, dtype=np.int32)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.occurrence_starts = np.ascontiguousarray(spans[order, 0])
+        self.occurrence_ends = np.ascontiguousarray(spans[order, 1])
+        self.occurrence_tokens = token_numbers[order]
+
+        # Postings are sorted by (term, document) as well
+        posting_terms = np.repeat(np.arange(len(self.vocabulary), dtype=np.int64), np.diff(self.indptr))
+        posting_keys = posting_terms * num_docs + self.indices
+        self.occurrence_lo = np.searchsorted(keys, posting_keys, side="left")
+        self.occurrence_hi = np.searchsorted(keys, posting_keys, side="right")
+
+    def row(self, term_id: int):
+        """(document ids, weights) of one term"""
+        start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        return self.indices[start:end], self.weights[start:end]
+
+    def term_ids(self, tokens: List[str]):
+        """Vocabulary ids of the query tokens, repeats kept, unknown tokens dropped"""
+        return [self.vocabulary[token] for token in tokens if token in self.vocabulary]
+
+    def scores(self, term_ids: List[int]):
+        """BM25 score of every document"""
+        if not term_ids:
+            return np.zeros(len(self.documents))
+        rows = [self.row(term_id) for term_id in term_ids]
+        return np.bincount(
+            np.concatenate([indices for indices, _ in rows]),
+            weights=np.concatenate([weights for _, weights in rows]),
+            minlength=len(self.documents)
+        )
+
+    def _lookup(self, term_id: int, candidates: np.ndarray):
+        """Weights of one term for sorted candidate documents, 0 where absent"""
+        # Rows are never empty and their document ids are sorted
+        indices, weights = self.row(term_id)
+        found = np.minimum(np.searchsorted(indices, candidates), len(indices) - 1)
+        return np.where(indices[found] == candidates, weights[found], 0.0)
+
+    def occurrences(self, term_ids: List[int], position: int):
+        """Sorted (starts, ends) of the given terms in one document"""
+        starts = []
+        ends = []
+        for term_id in set(term_ids):
+            indices, _ = self.row(term_id)
+            found = np.searchsorted(indices, position)
+            if found < len(indices) and indices[found] == position:
+                posting = self.indptr[term_id] + found
+                lo, hi = self.occurrence_lo[posting], self.occurrence_hi[posting]
+                starts.append(self.occurrence_starts[lo:hi])
+                ends.append(self.occurrence_ends[lo:hi])
+        if not starts:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        starts = np.concatenate(starts)
+        ends = np.concatenate(ends)
+        order = np.argsort(starts, kind="stable")
+        return starts[order], ends[order]
+
+    def token_positions(self, term_id: int, candidates: np.ndarray):
+        """(owner, token numbers) of a term's occurrences in sorted candidate documents
+
+        owner[i] is the index in `candidates` of the document occurrence i is in.
+        """
+        indices, _ = self.row(term_id)
+        found = np.minimum(np.searchsorted(indices, candidates), len(indices) - 1)
+        present = indices[found] == candidates
+        postings = self.indptr[term_id] + found[present]
+        lo = self.occurrence_lo[postings]
+        lengths = self.occurrence_hi[postings] - lo
+        owner = np.repeat(np.flatnonzero(present), lengths)
+        # Concatenated ranges lo[j]:hi[j], without a Python loop
+        first = np.repeat(lo - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return owner, self.occurrence_tokens[first + np.arange(lengths.sum())]
+
+    def snippet(self, term_ids: List[int], position: int, before: int = 100, after: int = 300):
+        """(start, end, highlights) of the preview window of one document
+
+        The window is anchored `before` characters ahead of the match that
+        has the most other matches within `after` characters of it.
+        Highlights are spans relative to the window start.
+        """
+        length = len(self.documents[position].content)
+        starts, ends = self.occurrences(term_ids, position)
+        if not len(starts):
+            return 0, min(length, before + after), []
+        covered = np.searchsorted(starts, starts + after, side="left") - np.arange(len(starts))
+        anchor = int(starts[np.argmax(covered)])
+        window_start = max(0, anchor - before)
+        window_end = min(length, anchor + after)
+        inside = (starts >= window_start) & (ends <= window_end)
+        highlights = [
+            [int(start) - window_start, int(end) - window_start]
+            for start, end in zip(starts[inside], ends[inside])
+        ]
+        return window_start, window_end, highlights
+
+    def _exact_scores(self, term_ids: List[int], candidates: np.ndarray):
+        """Scores of some documents, summed in query order like scores() does"""
+        scores = np.zeros(len(candidates))
+        for term_id in term_ids:
+            scores += self._lookup(term_id, candidates)
+        return scores
+
+    def top_k(self, term_ids: List[int], top_k: int, candidates: Optional[np.ndarray] = None):
+        """(document positions, scores) of the best `top_k` documents, best first
+
+        Ties go to the document that comes first in the store. `candidates`
+        (sorted positions, e.g. from a metadata filter) limits the documents
+        considered; a selective filter is scored by probing only its members.
+        """
+        if candidates is None:
+            scores = self.scores(term_ids)
+            return _select_top_k(np.arange(len(scores)), scores, top_k)
+        postings = sum(int(self.indptr[term_id + 1] - self.indptr[term_id]) for term_id in term_ids)
+        if len(candidates) * len(term_ids) < postings:
+            scores = self._exact_scores(term_ids, candidates)
+        else:
+            scores = self.scores(term_ids)[candidates]
+        return _select_top_k(candidates, scores, top_k)
+
+    def top_k_pruned(self, term_ids: List[int], top_k: int):
+        """Same result as top_k(), skipping documents that can't make the cut
+
+        MaxScore: query terms are ordered by the most they can add to a
+        score. Postings of the high-impact ("essential") terms are scored
+        in full; the low-impact terms, whose bounds together stay under the
+        current k-th best score, can't lift a document that lacks every
+        essential term into the top k, so their postings are only probed
+        for surviving candidates. Survivors are rescored exactly at the end.
+        """
+        top_k = min(top_k, len(self.documents))
+        if not term_ids or top_k <= 0:
+            return self.top_k(term_ids, top_k)
+
+        unique_terms, counts = np.unique(term_ids, return_counts=True)
+        bounds = self.max_weights[unique_terms] * counts
+        order = np.argsort(-bounds, kind="stable")
+        unique_terms, counts, bounds = unique_terms[order], counts[order], bounds[order]
+        # remaining[i]: the most terms i.. can add together
+        remaining = np.append(np.cumsum(bounds[::-1])[::-1], 0.0)
+
+        # Grow the essential set until the other terms alone can't reach the
+        # threshold. Only documents a term touches can change the running
+        # top k, so the threshold never looks at the whole corpus
+        partial = np.zeros(len(self.documents))
+        touched = np.zeros(len(self.documents), dtype=bool)
+        best = np.zeros(0, dtype=np.int64)
+        threshold = 0.0
+        essential = 0
+        while essential < len(unique_terms):
+            indices, weights = self.row(unique_terms[essential])
+            if len(indices) > DENSE_TERM_FRACTION * len(self.documents):
+                # A common term would have to be scored in full, which is
+                # what one exhaustive pass does faster
+                return self.top_k(term_ids, top_k)
+            partial[indices] += weights * counts[essential]
+            touched[indices] = True
+            pool = np.concatenate([indices, best[~touched[best]]])
+            touched[indices] = False
+            best = pool[np.argpartition(-partial[pool], top_k - 1)[:top_k]] if len(pool) > top_k else pool
+            threshold = float(partial[best].min()) if len(best) == top_k else 0.0
+            essential += 1
+            if remaining[essential] < _slack(threshold):
+                break
+        candidates = np.flatnonzero(partial + remaining[essential] >= _slack(threshold))
+        partial = partial[candidates]
+
+        # Probe the non-essential terms for candidates that can still make it
+        for i in range(essential, len(unique_terms)):
+            partial = partial + self._lookup(unique_terms[i], candidates) * counts[i]
+            threshold = max(threshold, _kth_largest(partial, top_k))
+            keep = partial + remaining[i + 1] >= _slack(threshold)
+            candidates, partial = candidates[keep], partial[keep]
+
+        scores = self._exact_scores(term_ids, candidates)
+        positions, best = _select_top_k(candidates, scores, top_k)
+        # Zero scores tie with documents that were never candidates
+        if len(positions) < top_k or best[-1] <= 0:
+            return self.top_k(term_ids, top_k)
+        return positions, best
+
+def _token_spans(token_pattern, text: str):
+    """(start, end) character spans of the tokens in `text`, as an (n, 2) array
+
+    Word characters match either case, so these are the tokens the store's lowercased
+    tokenization sees. The default pattern is evaluated on the code points
+    with NumPy rather than match by match.
+    """
+    if token_pattern.pattern != DEFAULT_TOKEN_PATTERN:
+        return np.array([match.span() for match in token_pattern.finditer(text)], dtype=np.int32).reshape(-1, 2)
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    is_word = _ASCII_WORD[np.minimum(codes, 127)]
+    non_ascii = codes > 127
+    if non_ascii.any():
+        chars, inverse = np.unique(codes[non_ascii], return_inverse=True)
+        is_word[non_ascii] = np.array([_WORD_CHAR.match(chr(c)) is not None for c in chars])[inverse]
+    edges = np.diff(np.concatenate([[0], is_word.view(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    # Tokens are runs of at least two word characters
+    longer = ends - starts >= 2
+    return np.stack([starts[longer], ends[longer]], axis=1).astype(np.int32)
+
+def _kth_largest(values: np.ndarray, k: int):
+    if len(values) < k:
+        return 0.0
+    return float(np.partition(values, len(values) - k)[len(values) - k])
+
+def _slack(threshold: float):
+    # Bounds are summed in a different order than exact scores, leave room for rounding
+    return threshold - 1e-9 * abs(threshold)
+
+def _select_top_k(positions: np.ndarray, scores: np.ndarray, top_k: int):
+    """Best `top_k` of sorted positions by score, lower positions first among ties"""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return positions[:0], scores[:0]
+    kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:top_k - len(above)]
+    chosen = np.concatenate([above, ties])
+    chosen = chosen[np.lexsort((positions[chosen], -scores[chosen]))]
+    return positions[chosen], scores[chosen]
+
+class SparseBM25Retriever(BaseRetriever):
+    """Drop-in BM25Retriever for InMemoryDocumentStore backed by SparseBM25Index
+
+    The index is rebuilt lazily whenever the store's BM25 representation
+    changes, i.e. after documents are written or deleted; call get_index()
+    after loading documents to build it up front.
+
+    Scores are the store's BM25 scores. Documents with equal scores come
+    back in store order; BM25Retriever leaves them in whatever order
+    NumPy's unstable argsort does, which varies with the NumPy build, and
+    it ranks on the scaled scores, where nearly equal high scores can tie.
+    """
+
+    def __init__(
+        self,
+        document_store,
+        top_k: int = 10,
+        scale_score: bool = True,
+        pruning: bool = False,
+        positions: bool = True
+    ):
+        super().__init__()
+        self.document_store = document_store
+        self.top_k = top_k
+        self.scale_score = scale_score
+        # Use SparseBM25Index.top_k_pruned (same results, fewer postings scored)
+        self.pruning = pruning
+        # Keep a positional index for snippet()
+        self.positions = positions
+        self._lock = threading.Lock()
+        self._bm25 = None
+        self._index = None
+        # (bm25, SparseBM25Index.state()) to build the next index from, see restore_index()
+        self._restored = None
+
+    def get_index(self):
+        index = self.document_store.index
+        bm25 = self.document_store.bm25.get(index)
+        if bm25 is not self._bm25:
+            with self._lock:
+                if bm25 is not self._bm25:
+                    # Store order, the BM25 corpus is positionally aligned with it
+                    documents = [
+                        doc for doc in self.document_store.indexes[index].values()
+                        if doc.content_type in ("text", "table")
+                    ]
+                    state = None
+                    if self._restored is not None and self._restored[0] is bm25:
+                        state = self._restored[1]
+                    self._restored = None
+                    self._index = (
+                        SparseBM25Index(bm25, documents, token_pattern=self._token_pattern(), state=state)
+                        if bm25 is not None else None
+                    )
+                    self._bm25 = bm25
+        return self._index
+
+    def restore_index(self, bm25, state):
+        """Build the index of `bm25` from a saved index_state() instead of from scratch
+
+        Only used if the store still holds that very BM25 object when the
+        index is built; writing or deleting documents replaces it.
+        """
+        with self._lock:
+            self._restored = (bm25, state) if bm25 is not None and state is not None else None
+
+    def index_state(self):
+        """SparseBM25Index.state() of the current index, None before any documents"""
+        bm25_index = self.get_index()
+        return bm25_index.state() if bm25_index is not None else None
+
+    def _token_pattern(self):
+        if not self.positions:
+            return None
+        # The store keeps the compiled pattern's findall, the pattern is its __self__
+        return getattr(self.document_store.bm25_tokenization_regex, "__self__", None)
+
+    def _term_ids(self, bm25_index, query: str):
+        return bm25_index.term_ids(self.document_store.bm25_tokenization_regex(query.lower()))
+
+    def filter_documents(self, filters):
+        """Documents matching metadata `filters` (see MetadataIndex.select), in store order"""
+        bm25_index = self.get_index()
+        if bm25_index is None:
+            return []
+        return [bm25_index.documents[position] for position in bm25_index.metadata.select(filters).to_array()]
+
+    def snippet(self, doc_id: str, query: str, before: int = 100, after: int = 300):
+        """Preview window of a document for a query, see SparseBM25Index.snippet
+
+        None if the document isn't indexed or positions are disabled.
+        """
+        bm25_index = self.get_index()
+        if bm25_index is None or bm25_index.occurrence_starts is None:
+            return None
+        position = bm25_index.doc_positions.get(doc_id)
+        if position is None:
+            return None
+        return bm25_index.snippet(self._term_ids(bm25_index, query), position, before, after)
+
+    def retrieve(
+        self,
+        query: str,
+        filters=None,
+        top_k: Optional[int] = None,
+        index: Optional[str] = None,
+        headers=None,
+        scale_score: Optional[bool] = None,
+        document_store=None
+    ) -> List[Document]:
+        top_k = top_k or self.top_k
+        scale_score = self.scale_score if scale_score is None else scale_score
+        bm25_index = self.get_index()
+        if bm25_index is None or not query:
+            return []
+
+        term_ids = self._term_ids(bm25_index, query)
+        if filters:
+            # Filtered before scoring, only matching documents are scored
+            allowed = bm25_index.metadata.select(filters).to_array()
+            positions, scores = bm25_index.top_k(term_ids, top_k, candidates=allowed)
+        elif self.pruning:
+            positions, scores = bm25_index.top_k_pruned(term_ids, top_k)
+        else:
+            positions, scores = bm25_index.top_k(term_ids, top_k)
+        if scale_score:
+            # Same scaling as InMemoryDocumentStore.query
+            scores = expit(scores / 8)
+
+        documents = []
+        for position, score in zip(positions, scores):
+            doc = copy.copy(bm25_index.documents[position])
+            doc.score = float(score)
+            documents.append(doc)
+        return documents
+
+    def retrieve_boolean(
+        self, query: str, filters=None, top_k: Optional[int] = None, scale_score: Optional[bool] = None
+    ):
+        """Documents matching a boolean query (see query_syntax.parse_query), best BM25 first
+
+        Matches are found from the postings and the positional index, then
+        ranked by BM25 over the query's positive terms. Raises
+        QuerySyntaxError for malformed queries.
+        """
+        top_k = top_k or self.top_k
+        scale_score = self.scale_score if scale_score is None else scale_score
+        bm25_index = self.get_index()
+        node = parse_query(query, self.document_store.bm25_tokenization_regex)
+        if bm25_index is None or node is None:
+            return []
+        if bm25_index.occurrence_starts is None and _has_phrase(node):
+            raise QuerySyntaxError("Phrase and proximity queries need the positional index")
+
+        matches = evaluate(node, bm25_index)
+        if filters:
+            matches = intersect(matches, bm25_index.metadata.select(filters).to_array())
+        scores = bm25_index._exact_scores(bm25_index.term_ids(positive_tokens(node)), matches)
+        positions, scores = _select_top_k(matches, scores, top_k)
+        if scale_score:
+            scores = expit(scores / 8)
+
+        documents = []
+        for position, score in zip(positions, scores):
+            doc = copy.copy(bm25_index.documents[position])
+            doc.score = float(score)
+            documents.append(doc)
+        return documents
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        filters=None,
+        top_k: Optional[int] = None,
+        index: Optional[str] = None,
+        headers=None,
+        batch_size: Optional[int] = None,
+        scale_score: Optional[bool] = None,
+        document_store=None
+    ) -> List[List[Document]]:
+        if isinstance(filters, list):
+            return [
+                self.retrieve(query, filters=query_filters, top_k=top_k, scale_score=scale_score)
+                for query, query_filters in zip(queries, filters)
+            ]
+        return [self.retrieve(query, filters=filters, top_k=top_k, scale_score=scale_score) for query in queries]
+
+def _has_phrase(node):
+    if node[0] == "phrase":
+        return True
+    if node[0] == "not":
+        return _has_phrase(node[1])
+    return node[0] in ("and", "or") and any(_has_phrase(child) for child in node[1])
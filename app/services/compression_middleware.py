@@ -0,0 +1,112 @@
+import gzip
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always offered
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/csv")
+# Bodies at least this big are compressed off the event loop
+THREADPOOL_MIN_SIZE = 64 * 1024
+
+def parse_accept_encoding(value: str):
+    """{coding: q} from an Accept-Encoding header"""
+    codings = {}
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+def choose_encoding(accept_encoding: str, available):
+    """Best of `available` (in server preference order) the client accepts, or None"""
+    codings = parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = codings.get(coding, codings.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+class CompressionMiddleware:
+    """Negotiated brotli/gzip compression of complete responses
+
+    Only bodies of at least `minimum_size` bytes with a compressible content
+    type are compressed. Streamed responses (/query/stream) pass through
+    untouched so their events aren't held back in a compressor buffer.
+    A strong ETag becomes weak on the compressed variant, as its bytes
+    differ from the identity one.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 5, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.available = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.available)
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Held until the first body chunk shows whether the response streams
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not self._compressible(start["status"], headers):
+                await send(start)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if message.get("more_body") or encoding is None or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+            if len(body) >= THREADPOOL_MIN_SIZE:
+                body = await run_in_threadpool(self.compress, body, encoding)
+            else:
+                body = self.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, status: int, headers):
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in COMPRESSIBLE_TYPES
+
+    def compress(self, body: bytes, encoding: str):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        # mtime=0 keeps the output byte-identical across requests, friendlier to caches
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
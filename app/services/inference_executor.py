@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+class InferenceQueueFull(Exception):
+    pass
+
+class InferenceExecutor:
+    """Dedicated worker threads for model inference with a bounded queue
+
+    Inference stays off the threadpool that serves the cheap endpoints. At
+    most `max_queue` calls wait for a free worker; past that `submit()`
+    raises InferenceQueueFull right away so the caller can shed the load
+    instead of letting latencies grow without limit.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 16, name: str = "inference"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        # Queue wait of the most recent calls, in seconds
+        self._waits = deque(maxlen=1024)
+        self._stats = {"submitted": 0, "rejected": 0, "cancelled": 0, "completed": 0, "failed": 0}
+
+    def submit(self, fn, *args, **kwargs):
+        """Future of `fn(*args, **kwargs)` run on an inference worker"""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise InferenceQueueFull(f"Inference queue is full ({self.max_queue} waiting)")
+            self._queued += 1
+            self._stats["submitted"] += 1
+        enqueued = time.monotonic()
+
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._waits.append(time.monotonic() - enqueued)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self._stats["failed"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+            with self._lock:
+                self._stats["completed"] += 1
+            return result
+
+        future = self._executor.submit(run)
+        future.add_done_callback(self._release_cancelled)
+        return future
+
+    def _release_cancelled(self, future):
+        # A future cancelled while queued (e.g. its awaiting request went
+        # away) never reaches run(), so its queue slot is given back here
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._stats["cancelled"] += 1
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits) * 1000
+            return {
+                **self._stats,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "wait_ms": {
+                    "mean": round(float(waits.mean()), 3) if len(waits) else 0.0,
+                    "p50": round(float(np.percentile(waits, 50)), 3) if len(waits) else 0.0,
+                    "p95": round(float(np.percentile(waits, 95)), 3) if len(waits) else 0.0,
+                    "max": round(float(waits.max()), 3) if len(waits) else 0.0
+                }
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
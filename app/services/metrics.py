@@ -0,0 +1,230 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, finer than Prometheus' defaults at the low end
+# where tokenization, retrieval and cache hits land
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values.items()]
+
+class Gauge(_Metric):
+    """A gauge set by the code, or read from `function()` at scrape time
+
+    `function` returns a number, or {label values tuple: number} when the
+    gauge has labels. With `kind="counter"` it exposes a counter kept
+    elsewhere (e.g. the query cache's own hit count).
+    """
+
+    def __init__(self, name: str, help: str, labels=(), function=None, kind: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.function = function
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.function is None:
+            with self._lock:
+                values = dict(self._values)
+        else:
+            values = self.function()
+            if not isinstance(values, dict):
+                values = {(): values}
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values.items() if value is not None
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the `with` block took, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text format
+
+    Each worker process has its own registry; Prometheus sums them per
+    instance when scraping every worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def counter(self, name: str, help: str, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels=(), function=None, kind: str = "gauge"):
+        return self.register(Gauge(name, help, labels, function, kind))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # One broken scrape-time function shouldn't take down the endpoint
+                samples = []
+                lines.append(f"# {metric.name} unavailable: {e.__class__.__name__}")
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Response adds the charset
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter(
+    "news_api_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "news_api_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "news_api_stage_duration_seconds",
+    "Time spent in each pipeline stage (retrieval, reader, reader_tokenize, reader_inference, reader_postprocess, mongo_*)",
+    ("stage",)
+)
+
+def time_stage(stage: str):
+    """`with time_stage("retrieval"):` records the block in STAGE_SECONDS"""
+    return STAGE_SECONDS.time(stage=stage)
+
+class MetricsMiddleware:
+    """Count and time every HTTP request by its route template
+
+    The route is the path pattern (/articles/{article_id}), not the raw
+    path, so label cardinality stays bounded; unmatched paths share one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            REQUESTS.inc(method=scope["method"], route=route, status=status)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=route)
@@ -0,0 +1,201 @@
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.model_server")
+
+# Request: one JSON line {"shm": name, "rows": r, "width": w} over a Unix socket.
+# The shared memory block named there holds, back to back:
+#   input_ids       int64   (r, w)
+#   attention_mask  int64   (r, w)
+#   start_logits    float32 (r, w)  written by the server
+#   end_logits      float32 (r, w)  written by the server
+# Reply: {"ok": true} or {"error": message}. Only the header crosses the
+# socket, the tensors are never pickled or copied through it.
+
+def _block_size(rows: int, width: int):
+    return rows * width * (8 + 8 + 4 + 4)
+
+def _tensors(shm, rows: int, width: int):
+    """(input_ids, attention_mask, start_logits, end_logits) views into a block"""
+    count = rows * width
+    return (
+        np.ndarray((rows, width), dtype=np.int64, buffer=shm.buf, offset=0),
+        np.ndarray((rows, width), dtype=np.int64, buffer=shm.buf, offset=8 * count),
+        np.ndarray((rows, width), dtype=np.float32, buffer=shm.buf, offset=16 * count),
+        np.ndarray((rows, width), dtype=np.float32, buffer=shm.buf, offset=20 * count)
+    )
+
+# Views into the block only live inside these helpers, so it can be closed
+# afterwards without "exported pointers exist" errors
+def _write_inputs(shm, input_ids: np.ndarray, attention_mask: np.ndarray):
+    ids, mask, _, _ = _tensors(shm, *input_ids.shape)
+    ids[:] = input_ids
+    mask[:] = attention_mask
+
+def _read_outputs(shm, rows: int, width: int):
+    _, _, start, end = _tensors(shm, rows, width)
+    return start.copy(), end.copy()
+
+class ModelServerError(Exception):
+    pass
+
+class _Connection:
+    def __init__(self, socket_path: str):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(socket_path)
+        self.file = self.socket.makefile("rwb")
+        self.shm = None
+
+    def forward(self, input_ids: np.ndarray, attention_mask: np.ndarray):
+        rows, width = input_ids.shape
+        size = _block_size(rows, width)
+        if self.shm is None or self.shm.size < size:
+            # Grow in powers of two so varying batch shapes reuse the block
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=1 << max(size - 1, 1).bit_length())
+        _write_inputs(self.shm, input_ids, attention_mask)
+        self.file.write(json.dumps({"shm": self.shm.name, "rows": rows, "width": width}).encode() + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Model server closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise ModelServerError(reply["error"])
+        return _read_outputs(self.shm, rows, width)
+
+    def _release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self._release()
+        self.file.close()
+        self.socket.close()
+
+class ModelClient:
+    """Forward passes of a QA model served by another process
+
+    Connections are pooled, each with its own shared memory block for the
+    tensors. A broken connection (e.g. a restarted server) is retried once
+    on a fresh one.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._idle = queue.LifoQueue()
+
+    def forward(self, input_ids: np.ndarray, attention_mask: np.ndarray):
+        """(start_logits, end_logits) of one padded batch"""
+        for attempt in range(2):
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = _Connection(self.socket_path)
+            try:
+                result = connection.forward(input_ids, attention_mask)
+            except ModelServerError:
+                # The server failed this batch but the connection is fine
+                self._idle.put(connection)
+                raise
+            except (ConnectionError, OSError):
+                connection.close()
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                connection.close()
+                raise
+            self._idle.put(connection)
+            return result
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+def _attach(name: str):
+    shm = shared_memory.SharedMemory(name=name)
+    # The client owns the block, keep this process's tracker from unlinking it on exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+def _run(forward, shm, rows: int, width: int):
+    input_ids, attention_mask, start, end = _tensors(shm, rows, width)
+    start[:], end[:] = forward(input_ids, attention_mask)
+
+def _handle(connection, forward):
+    file = connection.makefile("rwb")
+    shm = None
+    try:
+        for line in file:
+            request = json.loads(line)
+            try:
+                if shm is None or shm.name != request["shm"].lstrip("/"):
+                    if shm is not None:
+                        shm.close()
+                    shm = _attach(request["shm"])
+                _run(forward, shm, request["rows"], request["width"])
+                reply = {"ok": True}
+            except Exception as e:
+                reply = {"error": f"{e.__class__.__name__}: {e}"}
+            file.write(json.dumps(reply).encode() + b"\n")
+            file.flush()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        if shm is not None:
+            shm.close()
+        file.close()
+        connection.close()
+
+def _serve_forever(listener, load_forward):
+    # Loaded after the fork, every process owns its own model
+    forward = load_forward()
+    log.info("model_server_ready", pid=os.getpid())
+    while True:
+        connection, _ = listener.accept()
+        threading.Thread(target=_handle, args=(connection, forward), daemon=True).start()
+
+def serve(socket_path: str, load_forward, processes: int = 1):
+    """Serve `load_forward()`'s forward function on a Unix socket
+
+    `load_forward` returns a function (input_ids, attention_mask) ->
+    (start_logits, end_logits). With several `processes` each loads its own
+    copy and they accept connections from the same socket.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    log.info("model_server_listening", socket=socket_path, processes=processes)
+    try:
+        if processes <= 1:
+            _serve_forever(listener, load_forward)
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_serve_forever, args=(listener, load_forward), daemon=True)
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,330 @@
+import inspect
+import os
+from typing import List, Optional
+
+import numpy as np
+import onnxruntime as ort
+from haystack.nodes.reader.base import BaseReader
+from haystack.schema import Answer, Document, Span
+from transformers import AutoTokenizer
+
+from app.services.metrics import time_stage
+from app.services.model_server import ModelClient
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.onnx_reader")
+
+def export_onnx_model(model_dir: str, onnx_dir: str, quantize: bool = False):
+    """Export a question answering checkpoint to ONNX, optionally int8-quantized
+
+    Exports are cached in `onnx_dir`, delete the files there after changing
+    the model.
+    """
+    os.makedirs(onnx_dir, exist_ok=True)
+    model_path = os.path.join(onnx_dir, "model.onnx")
+    if not os.path.exists(model_path):
+        import torch
+        from transformers import AutoModelForQuestionAnswering
+
+        log.info("onnx_export", model_dir=model_dir, onnx_dir=onnx_dir)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModelForQuestionAnswering.from_pretrained(model_dir)
+        model.config.return_dict = False
+        model.eval()
+        sample = tokenizer("What is this about?", "An article.", return_tensors="pt")
+        # Newer torch defaults to the dynamo exporter, which ignores dynamic_axes
+        export_options = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_options["dynamo"] = False
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                model_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["start_logits", "end_logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "start_logits": {0: "batch", 1: "sequence"},
+                    "end_logits": {0: "batch", 1: "sequence"}
+                },
+                opset_version=14,
+                **export_options
+            )
+
+    if not quantize:
+        return model_path
+
+    quantized_path = os.path.join(onnx_dir, "model.int8.onnx")
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        log.info("onnx_quantize", onnx_dir=onnx_dir)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+def create_session(model_dir: str, onnx_dir: Optional[str] = None, quantize: bool = False,
+                   num_threads: Optional[int] = None):
+    """ONNX Runtime CPU session of a question answering checkpoint, exported on first use"""
+    onnx_path = export_onnx_model(model_dir, onnx_dir or os.path.join(model_dir, "onnx"), quantize)
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+    return ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+def run_session(session, input_ids: np.ndarray, attention_mask: np.ndarray):
+    """(start_logits, end_logits) of one padded batch"""
+    start_logits, end_logits = session.run(
+        ["start_logits", "end_logits"],
+        {"input_ids": input_ids, "attention_mask": attention_mask}
+    )
+    return start_logits, end_logits
+
+class OnnxReader(BaseReader):
+    """Extractive QA reader running the model with ONNX Runtime on CPU
+
+    A drop-in replacement for TransformersReader: same parameters where they
+    apply, and the same Answer objects (scores are start * end probabilities,
+    context is `context_window_size` characters either side of the answer).
+    With `model_socket` the model runs in a model server process (see
+    app/services/model_server.py) and only tokenizing and decoding happen here.
+    """
+
+    def __init__(
+        self,
+        model_name_or_path: str,
+        onnx_dir: Optional[str] = None,
+        quantize: bool = False,
+        context_window_size: int = 70,
+        top_k: int = 10,
+        top_k_per_candidate: int = 3,
+        max_seq_len: int = 256,
+        doc_stride: int = 128,
+        max_answer_length: int = 15,
+        batch_size: int = 16,
+        num_threads: Optional[int] = None,
+        model_socket: Optional[str] = None
+    ):
+        super().__init__()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name_or_path, use_fast=True)
+        self.context_window_size = context_window_size
+        self.top_k = top_k
+        self.top_k_per_candidate = top_k_per_candidate
+        self.max_seq_len = max_seq_len
+        self.doc_stride = doc_stride
+        self.max_answer_length = max_answer_length
+        self.batch_size = batch_size
+        self.return_no_answers = False
+        # Optional PassageCache with pre-tokenized document windows
+        self.passage_cache = None
+
+        if model_socket:
+            self.session = None
+            self.model_client = ModelClient(model_socket)
+        else:
+            self.session = create_session(model_name_or_path, onnx_dir, quantize, num_threads)
+            self.model_client = None
+
+    def _tokenize(self, query: str, documents: List[Document]):
+        """Split (query, document) pairs into model-sized windows
+
+        Documents in the passage cache are cut from their ingest-time tokens,
+        only the question is tokenized here.
+        """
+        features = []
+        uncached = list(range(len(documents)))
+        stride = min(self.doc_stride, self.max_seq_len // 2)
+        question_ids = []
+        if self.passage_cache is not None:
+            question_ids = self.tokenizer(query, add_special_tokens=False)["input_ids"]
+        # CLS, SEP and SEP take the other three positions
+        window_len = self.max_seq_len - len(question_ids) - 3
+        if self.passage_cache is not None and window_len > stride:
+            uncached = []
+            prefix = [self.tokenizer.cls_token_id] + question_ids + [self.tokenizer.sep_token_id]
+            for doc_index, doc in enumerate(documents):
+                windows = self.passage_cache.windows(doc.id, window_len, stride)
+                if windows is None:
+                    uncached.append(doc_index)
+                    continue
+                for token_ids, offsets in windows:
+                    features.append({
+                        "doc_index": doc_index,
+                        "input_ids": prefix + token_ids.tolist() + [self.tokenizer.sep_token_id],
+                        "offsets": [None] * len(prefix) + [tuple(offset) for offset in offsets.tolist()] + [None]
+                    })
+
+        if uncached:
+            for feature in self._tokenize_pairs(query, [documents[i] for i in uncached]):
+                feature["doc_index"] = uncached[feature["doc_index"]]
+                features.append(feature)
+        return features
+
+    def _tokenize_pairs(self, query: str, documents: List[Document]):
+        encoded = self.tokenizer(
+            [query] * len(documents),
+            [doc.content for doc in documents],
+            truncation="only_second",
+            max_length=self.max_seq_len,
+            stride=min(self.doc_stride, self.max_seq_len // 2),
+            return_overflowing_tokens=True,
+            return_offsets_mapping=True
+        )
+        features = []
+        for i, input_ids in enumerate(encoded["input_ids"]):
+            features.append({
+                "doc_index": encoded["overflow_to_sample_mapping"][i],
+                "input_ids": input_ids,
+                "offsets": self._word_offsets(encoded, i)
+            })
+        return features
+
+    def _word_offsets(self, encoded, i: int):
+        """Character span of the word each context token belongs to, None elsewhere
+
+        Answers are widened to whole words, like the transformers QA pipeline.
+        """
+        offsets = []
+        for offset, sequence_id, word_id in zip(
+            encoded["offset_mapping"][i], encoded.sequence_ids(i), encoded.word_ids(i)
+        ):
+            if sequence_id != 1:
+                offsets.append(None)
+            elif word_id is None:
+                offsets.append(tuple(offset))
+            else:
+                word = encoded.word_to_chars(i, word_id, sequence_index=1)
+                offsets.append((word.start, word.end))
+        return offsets
+
+    def _forward(self, input_ids: np.ndarray, attention_mask: np.ndarray):
+        """Run the model on one padded batch, returning (start_logits, end_logits)"""
+        if self.model_client is not None:
+            return self.model_client.forward(input_ids, attention_mask)
+        return run_session(self.session, input_ids, attention_mask)
+
+    def _run_features(self, features):
+        """Attach start/end logits to every feature, `batch_size` windows at a time
+
+        Windows are bucketed by length first, so each padded batch holds
+        windows of about the same length and little padding goes through
+        the model.
+        """
+        pad_id = self.tokenizer.pad_token_id or 0
+        features = sorted(features, key=lambda feature: len(feature["input_ids"]))
+        for batch_start in range(0, len(features), self.batch_size):
+            batch = features[batch_start:batch_start + self.batch_size]
+            width = max(len(feature["input_ids"]) for feature in batch)
+            input_ids = np.full((len(batch), width), pad_id, dtype=np.int64)
+            attention_mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, feature in enumerate(batch):
+                input_ids[row, :len(feature["input_ids"])] = feature["input_ids"]
+                attention_mask[row, :len(feature["input_ids"])] = 1
+            start_logits, end_logits = self._forward(input_ids, attention_mask)
+            for row, feature in enumerate(batch):
+                length = len(feature["input_ids"])
+                feature["start_logits"] = start_logits[row, :length]
+                feature["end_logits"] = end_logits[row, :length]
+
+    def _decode(self, feature):
+        """Best (score, char_start, char_end) spans of one window"""
+        context = np.array([offset is not None for offset in feature["offsets"]])
+        if not context.any():
+            return []
+
+        # Same normalisation as the transformers QA pipeline: question tokens
+        # are masked, CLS takes part in the softmax but can't be an answer
+        allowed = context | (np.asarray(feature["input_ids"]) == self.tokenizer.cls_token_id)
+        start = np.where(allowed, feature["start_logits"], -10000.0)
+        end = np.where(allowed, feature["end_logits"], -10000.0)
+        start = np.exp(start - start.max())
+        start /= start.sum()
+        end = np.exp(end - end.max())
+        end /= end.sum()
+        start[~context] = 0.0
+        end[~context] = 0.0
+
+        scores = np.tril(np.triu(np.outer(start, end)), self.max_answer_length - 1)
+        flat = scores.ravel()
+        # Extra candidates, several tokens of one word collapse into one answer
+        count = min(self.top_k_per_candidate * 2 + 10, flat.size)
+        best = np.argpartition(-flat, count - 1)[:count]
+        best = best[np.argsort(-flat[best])]
+
+        spans = []
+        for index in best:
+            start_token, end_token = np.unravel_index(index, scores.shape)
+            if flat[index] <= 0:
+                continue
+            spans.append((float(flat[index]), feature["offsets"][start_token][0], feature["offsets"][end_token][1]))
+        return spans
+
+    def _answers(self, documents: List[Document], features, top_k: int):
+        per_document = {}
+        for feature in features:
+            doc = documents[feature["doc_index"]]
+            candidates = per_document.setdefault(feature["doc_index"], {})
+            for score, char_start, char_end in self._decode(feature):
+                # Candidates with the same text pool their scores, as in the pipeline
+                text = doc.content[char_start:char_end]
+                if text in candidates:
+                    candidates[text][0] += score
+                else:
+                    candidates[text] = [score, char_start, char_end]
+
+        answers = []
+        for doc_index, candidates in per_document.items():
+            doc = documents[doc_index]
+            best = sorted(candidates.items(), key=lambda item: item[1][0], reverse=True)[:self.top_k_per_candidate]
+            for text, (score, char_start, char_end) in best:
+                context_start = max(0, char_start - self.context_window_size)
+                context_end = min(len(doc.content), char_end + self.context_window_size)
+                answers.append(Answer(
+                    answer=text,
+                    type="extractive",
+                    score=score,
+                    context=doc.content[context_start:context_end],
+                    offsets_in_document=[Span(start=char_start, end=char_end)],
+                    offsets_in_context=[Span(start=char_start - context_start, end=char_end - context_start)],
+                    document_ids=[doc.id],
+                    meta=doc.meta
+                ))
+        return sorted(answers, reverse=True)[:top_k]
+
+    def predict(self, query: str, documents: List[Document], top_k: Optional[int] = None):
+        top_k = top_k or self.top_k
+        if not documents:
+            return {"query": query, "answers": []}
+        with time_stage("reader_tokenize"):
+            features = self._tokenize(query, documents)
+        with time_stage("reader_inference"):
+            self._run_features(features)
+        with time_stage("reader_postprocess"):
+            answers = self._answers(documents, features, top_k)
+        return {"query": query, "answers": answers}
+
+    def predict_batch(self, queries: List[str], documents, top_k: Optional[int] = None, batch_size: Optional[int] = None):
+        """Answer each query over its own document list (or one shared list)
+
+        Windows from all queries go through the model together, so concurrent
+        questions share forward passes instead of running back to back.
+        """
+        top_k = top_k or self.top_k
+        if documents and isinstance(documents[0], Document):
+            documents = [documents] * len(queries)
+
+        groups = []
+        all_features = []
+        with time_stage("reader_tokenize"):
+            for query, docs in zip(queries, documents):
+                features = self._tokenize(query, docs) if docs else []
+                groups.append((docs, features))
+                all_features.extend(features)
+        with time_stage("reader_inference"):
+            self._run_features(all_features)
+
+        with time_stage("reader_postprocess"):
+            answers = [self._answers(docs, features, top_k) for docs, features in groups]
+        return {"queries": queries, "answers": answers}
@@ -0,0 +1,176 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.passage_cache")
+
+# 2: raw token offsets plus word ids, widened per window
+CACHE_FORMAT = 2
+
+def widen_to_words(offsets: np.ndarray, word_ids: np.ndarray):
+    """Each token's offsets widened to the part of its word inside `offsets`
+
+    Matches word_to_chars() on an overflowing encoding: a word split by a
+    window edge only spans its tokens on this side of the edge. Word pieces
+    are contiguous, so a word's first and last token in the slice bound it.
+    """
+    offsets = np.array(offsets, dtype=np.int32)
+    words = word_ids >= 0
+    if words.any():
+        ids = word_ids[words]
+        _, first = np.unique(ids, return_index=True)
+        _, last_reversed = np.unique(ids[::-1], return_index=True)
+        last = len(ids) - 1 - last_reversed
+        # Index by position in the slice's word range, not the document's
+        base = ids.min()
+        starts = np.empty(ids.max() - base + 1, dtype=np.int32)
+        ends = np.empty(ids.max() - base + 1, dtype=np.int32)
+        word_offsets = offsets[words]
+        starts[ids[first] - base] = word_offsets[first, 0]
+        ends[ids[last] - base] = word_offsets[last, 1]
+        offsets[words, 0] = starts[ids - base]
+        offsets[words, 1] = ends[ids - base]
+    return offsets
+
+class PassageCache:
+    """Token ids of every document, kept in memory-mapped arrays
+
+    Documents are tokenized once at ingest time. For each token the cache
+    stores its id, character span and word id, so at query time the reader
+    only tokenizes the question and cuts its windows out of these arrays,
+    exactly where it would have cut them itself, with the same word spans.
+    """
+
+    def __init__(self, cache_dir: str, tokenizer):
+        self.cache_dir = cache_dir
+        self.tokenizer = tokenizer
+        self.settings = {
+            "format": CACHE_FORMAT,
+            "tokenizer": tokenizer.name_or_path,
+            "vocab_size": tokenizer.vocab_size
+        }
+        self.docs = {}
+        self.token_ids = None
+        self.offsets = None
+        self.word_ids = None
+
+    def _paths(self, directory):
+        return {
+            "index": os.path.join(directory, "index.json"),
+            "token_ids": os.path.join(directory, "token_ids.npy"),
+            "offsets": os.path.join(directory, "offsets.npy"),
+            "word_ids": os.path.join(directory, "word_ids.npy")
+        }
+
+    def _load(self):
+        paths = self._paths(self.cache_dir)
+        try:
+            with open(paths["index"], "r", encoding="utf-8") as file:
+                index = json.load(file)
+            if index.get("settings") != self.settings:
+                log.info("passage_cache_stale", reason="different tokenizer")
+                return
+            self.token_ids = np.load(paths["token_ids"], mmap_mode="r")
+            self.offsets = np.load(paths["offsets"], mmap_mode="r")
+            self.word_ids = np.load(paths["word_ids"], mmap_mode="r")
+            self.docs = index["docs"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning("passage_cache_unreadable", error=str(e))
+            self.docs = {}
+
+    def _tokenize(self, content: str):
+        """Token ids, character offsets and word ids (-1 for none) of one document"""
+        encoded = self.tokenizer(content, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        token_ids = np.asarray(encoded["input_ids"], dtype=np.int32)
+        offsets = np.asarray(encoded["offset_mapping"], dtype=np.int32).reshape(-1, 2)
+        word_ids = np.array([-1 if w is None else w for w in encoded.word_ids()], dtype=np.int32)
+        return token_ids, offsets, word_ids
+
+    def build(self, documents):
+        """Make the cache match `documents`, tokenizing only ones it doesn't have yet"""
+        self._load()
+        current_ids = {doc.id for doc in documents}
+        if self.token_ids is not None and set(self.docs) == current_ids:
+            log.info("passage_cache_current", documents=len(self.docs))
+            return
+
+        new_docs = {
+            doc.id: self._tokenize(doc.content)
+            for doc in documents
+            if doc.id not in self.docs
+        }
+        kept = {doc_id: span for doc_id, span in self.docs.items() if doc_id in current_ids}
+        total = sum(length for _, length in kept.values()) + sum(len(ids) for ids, _, _ in new_docs.values())
+
+        build_dir = f"{self.cache_dir}.building"
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.makedirs(build_dir)
+        paths = self._paths(build_dir)
+        token_ids = np.lib.format.open_memmap(paths["token_ids"], mode="w+", dtype=np.int32, shape=(total,))
+        offsets = np.lib.format.open_memmap(paths["offsets"], mode="w+", dtype=np.int32, shape=(total, 2))
+        word_ids = np.lib.format.open_memmap(paths["word_ids"], mode="w+", dtype=np.int32, shape=(total,))
+
+        docs = {}
+        position = 0
+        for doc_id, (start, length) in kept.items():
+            token_ids[position:position + length] = self.token_ids[start:start + length]
+            offsets[position:position + length] = self.offsets[start:start + length]
+            word_ids[position:position + length] = self.word_ids[start:start + length]
+            docs[doc_id] = [position, length]
+            position += length
+        for doc_id, (doc_token_ids, doc_offsets, doc_word_ids) in new_docs.items():
+            token_ids[position:position + len(doc_token_ids)] = doc_token_ids
+            offsets[position:position + len(doc_token_ids)] = doc_offsets
+            word_ids[position:position + len(doc_token_ids)] = doc_word_ids
+            docs[doc_id] = [position, len(doc_token_ids)]
+            position += len(doc_token_ids)
+        token_ids.flush()
+        offsets.flush()
+        word_ids.flush()
+        del token_ids, offsets, word_ids
+        with open(paths["index"], "w", encoding="utf-8") as file:
+            json.dump({"settings": self.settings, "docs": docs}, file)
+
+        # Swap the finished cache in; maps of the old files stay valid until dropped
+        old_dir = f"{self.cache_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.cache_dir):
+            os.replace(self.cache_dir, old_dir)
+        os.replace(build_dir, self.cache_dir)
+        self.token_ids = self.offsets = self.word_ids = None
+        self._load()
+        shutil.rmtree(old_dir, ignore_errors=True)
+        log.info("passage_cache_built", tokenized=len(new_docs), reused=len(kept))
+
+    def windows(self, doc_id: str, window_len: int, stride: int):
+        """(token_ids, word_offsets) windows of a document, or None if it isn't cached
+
+        Consecutive windows overlap by `stride` tokens, the same split the
+        tokenizer makes with return_overflowing_tokens, and words are widened
+        within each window as the uncached path does.
+        """
+        span = self.docs.get(doc_id)
+        if span is None:
+            return None
+        start, length = span
+        token_ids = self.token_ids[start:start + length]
+        offsets = self.offsets[start:start + length]
+        word_ids = self.word_ids[start:start + length]
+
+        windows = []
+        window_start = 0
+        while True:
+            window_end = min(window_start + window_len, length)
+            windows.append((
+                token_ids[window_start:window_end],
+                widen_to_words(offsets[window_start:window_end], np.asarray(word_ids[window_start:window_end]))
+            ))
+            if window_end >= length:
+                return windows
+            window_start = window_end - stride
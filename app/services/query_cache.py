@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+def normalize_query(query: str):
+    """Cache key form of a query: case and whitespace don't change results"""
+    return " ".join(query.lower().split())
+
+async def wait_claim(future):
+    """Await a QueryCache.claim() future on the event loop
+
+    The leader and every coalesced request share one future. Each waits
+    through a shield, so a request that is cancelled (its client went away)
+    doesn't cancel the future for all the others.
+    """
+    waiter = asyncio.wrap_future(future)
+    try:
+        return await asyncio.shield(waiter)
+    except asyncio.CancelledError:
+        # Nobody reads the outcome now, don't let a failure be logged as never retrieved
+        waiter.add_done_callback(lambda waiter: waiter.cancelled() or waiter.exception())
+        raise
+
+class QueryCache:
+    """LRU cache with a TTL for /search and /query results
+
+    Concurrent misses on the same key are coalesced: the first caller
+    computes, the others wait for its result instead of repeating the work.
+    Everything is dropped when `version()` changes, pass a function that
+    changes whenever the document store contents do.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, version=None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.version = version or (lambda: None)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._version = None
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_version(self):
+        version = self.version()
+        if version != self._version:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+        return version
+
+    def get(self, key):
+        """Cached value for `key`, None on a miss (which isn't counted, get_or_compute will)"""
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def claim(self, key):
+        """(future, leader) for a key that just missed with get()
+
+        The first caller becomes the leader: it computes the value and hands
+        it to complete() or fail(). Everyone else gets the leader's future,
+        so waiting for a result in flight needs no worker of its own. A value
+        cached in the meantime comes back as an already resolved future.
+        """
+        future = Future()
+        if self.max_entries <= 0:
+            return future, True
+        with self._lock:
+            version = self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                future.set_result(entry[1])
+                return future, False
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self._stats["coalesced"] += 1
+                return inflight[0], False
+            self._inflight[key] = (future, version)
+            self._stats["misses"] += 1
+        return future, True
+
+    def complete(self, key, future, value):
+        """Leader side of claim(): cache `value` and wake everyone waiting on it
+
+        A future that is already done (cancelled elsewhere) is left as is.
+        """
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[0] is future:
+                del self._inflight[key]
+                # A result computed against an older store isn't worth keeping
+                if inflight[1] == self._check_version():
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats["evictions"] += 1
+        if not future.done():
+            future.set_result(value)
+        return value
+
+    def fail(self, key, future, error: BaseException):
+        """Leader side of claim(): pass `error` to the waiters, nothing is cached"""
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[0] is future:
+                del self._inflight[key]
+        if not future.done():
+            future.set_exception(error)
+
+    def finish(self, key, future, compute):
+        """Leader side of claim(): complete() with `compute()`, or fail() with its error"""
+        try:
+            value = compute()
+        except BaseException as e:
+            self.fail(key, future, e)
+            raise
+        return self.complete(key, future, value)
+
+    def get_or_compute(self, key, compute):
+        """Cached value for `key`, calling `compute()` on a miss
+
+        Errors are passed to everyone waiting on the computation but are not
+        cached.
+        """
+        if self.max_entries <= 0:
+            return compute()
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+        return self.finish(key, future, compute)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hit_rate": round((self._stats["hits"] + self._stats["coalesced"]) / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,230 @@
+import re
+from typing import Callable, List
+
+import numpy as np
+
+# Query nodes are tuples:
+#   ("term", token)
+#   ("phrase", tokens, slop)  slop None: tokens adjacent and in order,
+#                             otherwise in any order within len(tokens) + slop tokens
+#   ("and", [nodes]), ("or", [nodes]), ("not", node)
+
+class QuerySyntaxError(ValueError):
+    pass
+
+_LEXER = re.compile(r'\s*(?:(?P<phrase>"(?P<text>[^"]*)"(?:~(?P<slop>\d+))?)|(?P<paren>[()])|(?P<word>[^\s()"]+))')
+
+def _lex(query: str):
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _LEXER.match(query, position)
+        if match is None:
+            raise QuerySyntaxError(f"Unbalanced quote at character {position}")
+        position = match.end()
+        if match.group("phrase") is not None:
+            slop = match.group("slop")
+            tokens.append(("phrase", match.group("text"), int(slop) if slop is not None else None))
+        elif match.group("paren") is not None:
+            tokens.append((match.group("paren"), None, None))
+        elif match.group("word") in ("AND", "OR", "NOT"):
+            tokens.append((match.group("word"), None, None))
+        else:
+            tokens.append(("word", match.group("word"), None))
+    return tokens
+
+def parse_query(query: str, tokenize: Callable[[str], List[str]]):
+    """Parse a boolean query into a node tree, None if nothing in it is searchable
+
+    Grammar, loosest binding first: `a OR b`, `a AND b` (or just `a b`),
+    `NOT a`, `( ... )`, `"a phrase"`, `"near terms"~5` and single words.
+    Operators are upper case. Words and phrases go through `tokenize`, the
+    same tokenizer as the index, so a word like "covid-19" is a phrase.
+    """
+    tokens = _lex(query)
+    position = 0
+
+    def peek():
+        return tokens[position][0] if position < len(tokens) else None
+
+    def parse_or():
+        nonlocal position
+        children = [parse_and()]
+        while peek() == "OR":
+            position += 1
+            children.append(parse_and())
+        return _combine("or", children)
+
+    def parse_and():
+        nonlocal position
+        children = [parse_unary()]
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                position += 1
+            children.append(parse_unary())
+        return _combine("and", children)
+
+    def parse_unary():
+        nonlocal position
+        if peek() == "NOT":
+            position += 1
+            child = parse_unary()
+            return ("not", child) if child is not None else None
+        return parse_primary()
+
+    def parse_primary():
+        nonlocal position
+        kind = peek()
+        if kind is None:
+            raise QuerySyntaxError("Query ends where a term was expected")
+        if kind == "(":
+            position += 1
+            node = parse_or()
+            if peek() != ")":
+                raise QuerySyntaxError("Missing closing parenthesis")
+            position += 1
+            return node
+        if kind in ("word", "phrase"):
+            _, text, slop = tokens[position]
+            position += 1
+            words = tokenize(text.lower())
+            if not words:
+                return None
+            if len(words) == 1:
+                return ("term", words[0])
+            return ("phrase", words, slop)
+        raise QuerySyntaxError(f"Unexpected '{kind}'")
+
+    if not tokens:
+        return None
+    node = parse_or()
+    if position < len(tokens):
+        raise QuerySyntaxError(f"Unexpected '{tokens[position][0]}'")
+    return node
+
+def _combine(operator: str, children):
+    # Words the tokenizer drops (too short, punctuation) leave no node
+    children = [child for child in children if child is not None]
+    if not children:
+        return None
+    return children[0] if len(children) == 1 else (operator, children)
+
+def positive_tokens(node):
+    """Tokens a matching document is searched for, i.e. not under a NOT"""
+    if node is None or node[0] == "not":
+        return []
+    if node[0] == "term":
+        return [node[1]]
+    if node[0] == "phrase":
+        return list(node[1])
+    return [token for child in node[1] for token in positive_tokens(child)]
+
+def intersect(a: np.ndarray, b: np.ndarray):
+    """Sorted ids present in both sorted arrays
+
+    The shorter list is searched for in the longer one. searchsorted with
+    sorted needles resumes from the previous hit, so each step skips ahead
+    over the longer list instead of walking it.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a) or not len(b):
+        return a[:0]
+    found = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[found] == a]
+
+def difference(a: np.ndarray, b: np.ndarray):
+    """Sorted ids of `a` that are not in sorted `b`"""
+    if not len(a) or not len(b):
+        return a
+    found = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[found] != a]
+
+def evaluate(node, index):
+    """Sorted positions of the documents of a SparseBM25Index matching `node`"""
+    kind = node[0]
+    if kind == "term":
+        term_id = index.vocabulary.get(node[1])
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64)
+        indices, _ = index.row(term_id)
+        return indices.astype(np.int64)
+    if kind == "phrase":
+        return _evaluate_phrase(node[1], node[2], index)
+    if kind == "or":
+        return np.unique(np.concatenate([evaluate(child, index) for child in node[1]]))
+    if kind == "not":
+        return difference(np.arange(len(index.documents)), evaluate(node[1], index))
+
+    # AND: intersect the positive children smallest first, then drop the negated ones
+    positive = [evaluate(child, index) for child in node[1] if child[0] != "not"]
+    negative = [evaluate(child[1], index) for child in node[1] if child[0] == "not"]
+    if positive:
+        positive.sort(key=len)
+        matches = positive[0]
+        for docs in positive[1:]:
+            matches = intersect(matches, docs)
+    else:
+        matches = np.arange(len(index.documents))
+    for docs in negative:
+        matches = difference(matches, docs)
+    return matches
+
+def _evaluate_phrase(words: List[str], slop, index):
+    term_ids = [index.vocabulary.get(word) for word in words]
+    if any(term_id is None for term_id in term_ids):
+        return np.zeros(0, dtype=np.int64)
+    candidates = evaluate(("and", [("term", word) for word in words]), index)
+    if not len(candidates):
+        return candidates
+
+    if slop is None:
+        # Shift every term's token numbers back by its offset in the phrase,
+        # a phrase match is a (document, start) key shared by all terms
+        keys = None
+        for offset, term_id in enumerate(term_ids):
+            owner, token_numbers = index.token_positions(term_id, candidates)
+            term_keys = np.unique(owner.astype(np.int64) * (1 << 32) + (token_numbers.astype(np.int64) - offset))
+            keys = term_keys if keys is None else intersect(keys, term_keys)
+        return candidates[np.unique(keys >> 32)] if keys is not None and len(keys) else candidates[:0]
+
+    # Proximity: some window of len(words) + slop tokens holds every term
+    width = len(words) + slop
+    occurrences = []
+    for term_id in dict.fromkeys(term_ids):
+        owner, token_numbers = index.token_positions(term_id, candidates)
+        # Owners come out sorted, bounds[i]:bounds[i + 1] belongs to candidate i
+        bounds = np.searchsorted(owner, np.arange(len(candidates) + 1))
+        occurrences.append((bounds, token_numbers))
+    matched = []
+    for owner_index in range(len(candidates)):
+        per_term = [
+            token_numbers[bounds[owner_index]:bounds[owner_index + 1]] for bounds, token_numbers in occurrences
+        ]
+        if _within_window(per_term, width):
+            matched.append(candidates[owner_index])
+    return np.array(matched, dtype=np.int64)
+
+def _within_window(per_term, width: int):
+    """Whether one occurrence of each term fits in `width` consecutive tokens"""
+    merged = np.concatenate(per_term)
+    labels = np.concatenate([np.full(len(tokens), term) for term, tokens in enumerate(per_term)])
+    order = np.argsort(merged, kind="stable")
+    merged, labels = merged[order], labels[order]
+
+    counts = np.zeros(len(per_term), dtype=np.int64)
+    missing = len(per_term)
+    left = 0
+    for right in range(len(merged)):
+        if counts[labels[right]] == 0:
+            missing -= 1
+        counts[labels[right]] += 1
+        while missing == 0:
+            if merged[right] - merged[left] < width:
+                return True
+            counts[labels[left]] -= 1
+            if counts[labels[left]] == 0:
+                missing += 1
+            left += 1
+    return False
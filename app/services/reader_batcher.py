@@ -0,0 +1,72 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from haystack.schema import Document
+
+from app.services.metrics import time_stage
+
+class ReaderBatcher:
+    """Coalesce concurrent reader calls into one batched forward pass
+
+    Callers block in `predict()` while a single worker thread gathers the
+    requests that arrive within `max_wait_ms` of the first one (up to
+    `max_batch_size` passages), runs them through `reader.predict_batch()`
+    and hands each caller its own answers back.
+    """
+
+    def __init__(self, reader, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.reader = reader
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="reader-batcher", daemon=True)
+        self._worker.start()
+
+    def predict(self, query: str, documents: List[Document], top_k: int):
+        """Same contract as BaseReader.predict, but shares the forward pass"""
+        if not documents:
+            return {"query": query, "answers": []}
+        future = Future()
+        self._queue.put((query, documents, top_k, future))
+        return future.result()
+
+    def queue_depth(self):
+        """Calls waiting for the next batch"""
+        return self._queue.qsize()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        passages = len(first[1])
+        deadline = time.monotonic() + self.max_wait
+        while passages < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            passages += len(item[1])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                with time_stage("reader"):
+                    result = self.reader.predict_batch(
+                        queries=[query for query, _, _, _ in batch],
+                        documents=[documents for _, documents, _, _ in batch],
+                        top_k=max(top_k for _, _, top_k, _ in batch)
+                    )
+            except Exception as e:
+                for _, _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (query, _, top_k, future), answers in zip(batch, result["answers"]):
+                future.set_result({"query": query, "answers": answers[:top_k]})
@@ -0,0 +1,200 @@
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.profiler")
+
+# Leaf frames of threads that are only waiting for work; they would
+# otherwise fill every profile with the idle pool and the event loop
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker")
+}
+
+def _frame_name(code):
+    # Folded stacks use ";" between frames, it can't appear inside one
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+def token_matches(value: str, token: str):
+    """Constant-time check of a header value against the admin token
+
+    Header values arrive decoded as latin-1 and compare_digest() rejects
+    non-ASCII str, so both sides are compared as bytes.
+    """
+    if not value or not token:
+        return False
+    return hmac.compare_digest(value.encode("latin-1", "replace"), token.encode("utf-8"))
+
+class StackSampler:
+    """Wall-clock sampling of every thread's Python stack
+
+    A background thread reads `sys._current_frames()` every `interval`
+    seconds, so the profiled code itself runs unmodified. Time spent on
+    inference workers and the reader batcher shows up under their thread
+    names, next to the event loop's.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._then = None
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, then=None):
+        """Stop sampling without waiting for the thread
+
+        `then(sampler)` runs on the sampler thread after its last sample, so
+        an async caller can hand off the finished profile without blocking.
+        """
+        self._then = then
+        self._stop.set()
+        return self
+
+    def _run(self):
+        try:
+            self._sample()
+        finally:
+            if self._then is not None:
+                self._then(self)
+
+    def _sample(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                name = names.get(ident, str(ident))
+                if name.startswith("profiler-"):
+                    continue
+                leaf = frame.f_code
+                if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(name)
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        """Profile in the folded stack format of flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+class ProfileStore:
+    """The most recent request profiles, optionally also written to `directory`"""
+
+    def __init__(self, max_profiles: int = 50, directory: str = None):
+        self.directory = directory
+        self._profiles = deque(maxlen=max_profiles)
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+        if self.directory:
+            with open(os.path.join(self.directory, f"{profile['id']}.folded"), "w") as f:
+                f.write(profile["folded"])
+
+    def list(self):
+        """Newest first, without the stacks"""
+        with self._lock:
+            profiles = list(self._profiles)
+        return [{key: value for key, value in profile.items() if key != "folded"} for profile in reversed(profiles)]
+
+    def get(self, profile_id: str):
+        with self._lock:
+            for profile in self._profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+class ProfilingMiddleware:
+    """Profile a request when asked to by header, or a sampled share of them
+
+    A request whose `X-Profile` header equals `token` is profiled, and so is
+    a random `sample_rate` share of requests under `paths`. The profile goes
+    to `store`, and its id comes back in the `X-Profile-Id` response header.
+    At most `max_concurrent` requests are profiled at once. Install it only
+    when a token or sample rate is configured; the app then runs without it.
+    """
+
+    def __init__(self, app, store: ProfileStore, token: str = None, sample_rate: float = 0.0,
+                 paths=("/query", "/search"), interval: float = 0.005, max_concurrent: int = 2):
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.paths = tuple(paths)
+        self.interval = interval
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def _trigger(self, scope):
+        if token_matches(Headers(scope=scope).get("x-profile"), self.token):
+            return "header"
+        if self.sample_rate > 0 and scope["path"].startswith(self.paths) and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None or not self._slots.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        profile_id = uuid.uuid4().hex
+        status = None
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(raw=message["headers"])["X-Profile-Id"] = profile_id
+            await send(message)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        sampler = StackSampler(self.interval).start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile = {
+                "id": profile_id,
+                "trigger": trigger,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope["query_string"].decode("latin-1"),
+                "status": status,
+                "started_at": round(started_at, 3),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "interval_ms": self.interval * 1000
+            }
+            # Joining the sampler and writing PROFILE_DIR happen on the sampler
+            # thread, the event loop keeps serving other requests meanwhile
+            sampler.stop(then=lambda finished: self._store(profile, finished))
+
+    def _store(self, profile, sampler):
+        try:
+            self.store.add({**profile, "samples": sampler.samples, "folded": sampler.folded()})
+        except Exception:
+            log.exception("profile_store_failed", profile_id=profile["id"])
+        finally:
+            self._slots.release()
@@ -0,0 +1,31 @@
+def make_etag(content_hash: str):
+    """Strong ETag of an article from the content hash computed at ingest"""
+    return f'"{content_hash[:32]}"'
+
+def etag_matches(if_none_match: str, etag: str):
+    """Whether an If-None-Match header matches `etag`
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so a
+    W/ tag from a compressed response still matches the strong one.
+    """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def cache_control(max_age: int, stale_while_revalidate: int = 0):
+    """Cache-Control value for a public response, max_age=0 forces revalidation"""
+    if max_age <= 0:
+        return "public, no-cache"
+    value = f"public, max-age={max_age}"
+    if stale_while_revalidate > 0:
+        value += f", stale-while-revalidate={stale_while_revalidate}"
+    return value
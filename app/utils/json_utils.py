@@ -0,0 +1,28 @@
+import orjson
+from bson import ObjectId
+from starlette.responses import Response
+
+def _default(value):
+    """Types orjson doesn't encode natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    # numpy scalars, e.g. reader scores
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content):
+    """JSON bytes of `content`; datetimes, ObjectIds and numpy values included"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+class FastJSONResponse(Response):
+    """JSON response encoded by orjson
+
+    Returning one from an endpoint skips FastAPI's jsonable_encoder pass
+    over the payload; `response_model` still documents the schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
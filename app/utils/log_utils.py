@@ -0,0 +1,80 @@
+import json
+import logging
+import os
+import sys
+import time
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event and its fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **getattr(record, "fields", {})
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """`time level logger event key=value ...` for reading in a terminal"""
+
+    def format(self, record):
+        fields = " ".join(f"{key}={value!r}" for key, value in getattr(record, "fields", {}).items())
+        line = f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))} {record.levelname:7s} " \
+               f"{record.name} {record.getMessage()}" + (f" {fields}" if fields else "")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class StructuredLogger:
+    """Leveled logger taking an event name and keyword fields
+
+    `log.debug("qa_result", answers=answers)` checks the level before
+    anything is built, so a disabled level costs one comparison. Compute
+    expensive fields only under `if log.enabled("debug"):`.
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+
+    def enabled(self, level: str):
+        return self._logger.isEnabledFor(logging.getLevelName(level.upper()))
+
+    def _log(self, level: int, event: str, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields):
+        """error() with the current exception's traceback"""
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+def get_logger(name: str):
+    return StructuredLogger(name)
+
+def configure_logging(level: str = None, format: str = None):
+    """Send the app's logs to stderr at LOG_LEVEL (info) in LOG_FORMAT (json or text)"""
+    level = (level or os.getenv("LOG_LEVEL", "info")).upper()
+    format = format or os.getenv("LOG_FORMAT", "json")
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if format == "json" else TextFormatter())
+    logger = logging.getLogger("news_api")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    # Our own handler, not also the root logger's
+    logger.propagate = False
@@ -0,0 +1,68 @@
+import json
+import os
+
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.manifest")
+
+MANIFEST_VERSION = 1
+
+def new_manifest():
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def load_manifest(path: str):
+    """Load an ingest manifest, starting over if it is missing or unreadable"""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest.get("version") == MANIFEST_VERSION and isinstance(manifest.get("files"), dict):
+            return manifest
+        log.warning("manifest_ignored", path=path, version=manifest.get("version"))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("manifest_unreadable", path=path, error=str(e))
+    return new_manifest()
+
+def save_manifest(path: str, manifest):
+    """Write the manifest atomically so a crash never leaves half a file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(tmp_path, path)
+
+def manifest_entry(archive_folder: str, filename: str, content_hash: str, doc_id):
+    """Describe one ingested archive file"""
+    stat = os.stat(os.path.join(archive_folder, filename))
+    return {
+        "path": os.path.join(archive_folder, filename),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "content_hash": content_hash,
+        "doc_id": doc_id
+    }
+
+def diff_archive(archive_folder: str, filenames, manifest):
+    """Split archive files into (changed, unchanged, deleted) against a manifest
+
+    Only size and mtime are compared here, so unchanged files are never
+    opened. Files whose stat changed but whose content hash did not are
+    reported as changed; callers compare `content_hash` after parsing.
+    """
+    known = manifest["files"]
+    changed = []
+    unchanged = []
+    for filename in filenames:
+        entry = known.get(filename)
+        if entry is not None:
+            stat = os.stat(os.path.join(archive_folder, filename))
+            if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                unchanged.append(filename)
+                continue
+        changed.append(filename)
+
+    present = set(filenames)
+    deleted = [filename for filename in known if filename not in present]
+    return changed, unchanged, deleted
@@ -1,6 +1,10 @@
 from typing import List, Dict, Any
 from datetime import datetime
 
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.mongo")
+
 def update_document(document_store, doc_id: str, updates: Dict[str, Any]):
     """Update an existing document"""
     try:
@@ -10,7 +14,7 @@ def update_document(document_store, doc_id: str, updates: Dict[str, Any]):
             document_store.write_documents([document])
             return True
     except Exception as e:
-        print(f"Error updating document {doc_id}: {str(e)}")
+        log.exception("document_update_failed", doc_id=doc_id)
     return False
 
 def delete_document(document_store, doc_id: str):
@@ -19,7 +23,7 @@ def delete_document(document_store, doc_id: str):
         document_store.delete_documents([doc_id])
         return True
     except Exception as e:
-        print(f"Error deleting document {doc_id}: {str(e)}")
+        log.exception("document_delete_failed", doc_id=doc_id)
     return False
 
 def search_documents(document_store, query: str, filters: Dict = None):
@@ -31,5 +35,5 @@ def search_documents(document_store, query: str, filters: Dict = None):
             top_k=10
         )
     except Exception as e:
-        print(f"Error searching documents: {str(e)}")
+        log.exception("document_search_failed", query=query)
         return []
\ No newline at end of file
@@ -0,0 +1,18 @@
+import base64
+import json
+
+def encode_cursor(publish_date, doc_id):
+    """Opaque cursor pointing just after the article (publish_date, doc_id)"""
+    payload = json.dumps([publish_date, doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """(publish_date, doc_id) of an encode_cursor() string, ValueError if it isn't one"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        publish_date, doc_id = json.loads(payload)
+    except Exception:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if not isinstance(doc_id, str):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return publish_date, doc_id
@@ -0,0 +1,13 @@
+def parse_fields(fields: str, allowed, default):
+    """Field names of a comma separated `fields=` parameter
+
+    `default` when the parameter is empty; ValueError naming any field
+    that isn't in `allowed`.
+    """
+    if not fields:
+        return list(default)
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown or not names:
+        raise ValueError(f"Unknown fields {unknown}, choose from: {', '.join(allowed)}")
+    return names
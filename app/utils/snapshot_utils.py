@@ -0,0 +1,69 @@
+import os
+import pickle
+import haystack
+
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.snapshot")
+
+SNAPSHOT_FORMAT = 1
+
+def _store_signature(document_store):
+    """Settings a snapshot must share with the store it is restored into"""
+    return {
+        "haystack_version": haystack.__version__,
+        "bm25_algorithm": getattr(document_store, "bm25_algorithm", None),
+        "bm25_parameters": getattr(document_store, "bm25_parameters", None)
+    }
+
+def save_snapshot(path: str, document_store, manifest, extras=None):
+    """Persist the loaded documents, their BM25 statistics and the ingest manifest
+
+    `extras` carries any other index state that should survive a restart.
+    """
+    index = document_store.index
+    payload = {
+        "format": SNAPSHOT_FORMAT,
+        "signature": _store_signature(document_store),
+        "manifest": manifest,
+        # Kept in store order, the BM25 corpus is positionally aligned with it
+        "documents": list(document_store.indexes[index].values()),
+        "bm25": document_store.bm25.get(index),
+        "extras": extras or {}
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_snapshot(path: str, document_store):
+    """Load a snapshot written by save_snapshot, or None if it can't be used
+
+    Snapshots are pickles, only point this at files this service wrote.
+    """
+    try:
+        with open(path, "rb") as file:
+            payload = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("snapshot_unreadable", path=path, error=str(e))
+        return None
+
+    if payload.get("format") != SNAPSHOT_FORMAT:
+        log.warning("snapshot_ignored", path=path, format=payload.get("format"))
+        return None
+    if payload.get("signature") != _store_signature(document_store):
+        log.warning("snapshot_ignored", path=path, reason="different store settings")
+        return None
+    return payload
+
+def restore_snapshot(document_store, snapshot):
+    """Put snapshot documents and BM25 statistics back without re-tokenizing"""
+    index = document_store.index
+    document_store.indexes[index] = {doc.id: doc for doc in snapshot["documents"]}
+    if snapshot["bm25"] is not None:
+        document_store.bm25[index] = snapshot["bm25"]
+    elif document_store.use_bm25:
+        document_store.update_bm25(index=index)
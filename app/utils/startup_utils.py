@@ -0,0 +1,51 @@
+import threading
+import time
+
+from app.utils.log_utils import get_logger
+
+log = get_logger("news_api.startup")
+
+class StartupTracker:
+    """Track the load status and timing of components started in the background"""
+
+    def __init__(self, components):
+        self._lock = threading.Lock()
+        self._components = {
+            name: {"status": "pending", "seconds": None, "error": None}
+            for name in components
+        }
+
+    def run(self, name: str, load):
+        """Run `load()` and record how it went; errors are recorded, not raised"""
+        with self._lock:
+            self._components[name].update(status="loading", error=None)
+        started = time.perf_counter()
+        try:
+            result = load()
+        except Exception as e:
+            log.exception("startup_component_failed", component=name)
+            with self._lock:
+                self._components[name].update(
+                    status="failed", seconds=round(time.perf_counter() - started, 3), error=str(e)
+                )
+            return None
+        with self._lock:
+            self._components[name].update(status="ready", seconds=round(time.perf_counter() - started, 3))
+        return result
+
+    def skip(self, name: str):
+        """Mark a component that doesn't apply to this configuration"""
+        with self._lock:
+            self._components[name].update(status="skipped")
+
+    def status(self, name: str):
+        with self._lock:
+            return self._components[name]["status"]
+
+    def is_ready(self, *names):
+        with self._lock:
+            return all(self._components[name]["status"] == "ready" for name in names)
+
+    def report(self):
+        with self._lock:
+            return {name: dict(component) for name, component in self._components.items()}
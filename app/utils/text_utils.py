@@ -1,3 +1,11 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Length of the ingest-time article summary shown by list endpoints
+SUMMARY_CHARS = 300
+
 def parse_article_content(content: str):
     """Parse article content with metadata"""
     lines = content.split('\n')
@@ -16,4 +24,72 @@ def parse_article_content(content: str):
         else:
             content_lines.append(line)
     
-    return metadata, '\n'.join(content_lines)
\ No newline at end of file
+    return metadata, '\n'.join(content_lines)
+
+def make_summary(content: str, max_chars: int = SUMMARY_CHARS):
+    """Whitespace-collapsed start of an article, cut at a word boundary"""
+    text = " ".join(content.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars + 1)
+    return text[:cut if cut > 0 else max_chars] + "..."
+
+def compute_content_hash(content: str):
+    """Return a stable hash of raw article text"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def extract_file_date(filename: str):
+    """Extract a YYYY-MM-DD date from a filename part like 20061117"""
+    for part in filename.split('_'):
+        if len(part) == 8 and part.isdigit():
+            year = part[:4]
+            month = part[4:6]
+            day = part[6:]
+            return f"{year}-{month}-{day}"
+    return None
+
+def read_article_file(path: str):
+    """Read and parse one archive file
+    
+    Runs inside the parse worker processes, so it returns plain data and
+    reports failures in the result instead of raising.
+    """
+    filename = os.path.basename(path)
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            content = file.read()
+        metadata, article_content = parse_article_content(content)
+        return {
+            "filename": filename,
+            "metadata": metadata,
+            "content": article_content,
+            "summary": make_summary(article_content),
+            "content_hash": compute_content_hash(content),
+            "file_date": extract_file_date(filename),
+            "empty": not content.strip(),
+            "error": None
+        }
+    except Exception as e:
+        return {"filename": filename, "error": str(e)}
+
+def iter_parsed_articles(archive_folder: str, filenames, workers: int = None):
+    """Read and parse archive files on a process pool
+    
+    Results are yielded in the order of `filenames` so the caller can keep
+    writing from a single thread. `workers=1` parses in-process.
+    """
+    paths = [os.path.join(archive_folder, filename) for filename in filenames]
+    workers = workers or os.cpu_count() or 1
+    
+    if workers == 1 or len(paths) < 2:
+        for path in paths:
+            yield read_article_file(path)
+        return
+    
+    # Hand out files in chunks so small articles don't pay one IPC round trip each
+    chunksize = max(1, min(64, len(paths) // (workers * 4)))
+    # Spawned, not forked: the API ingests on a startup thread while another
+    # loads the reader, and a forked child could inherit a lock one of them held
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        yield from executor.map(read_article_file, paths, chunksize=chunksize)
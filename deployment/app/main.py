@@ -1,10 +1,13 @@
 from haystack.document_stores import MongoDocumentStore
 from dotenv import load_dotenv
+from app.utils.text_utils import iter_parsed_articles
 import os
 
 # Load environment variables
 load_dotenv()
 
+ingest_workers = int(os.getenv("INGEST_WORKERS", "0")) or None  # 0 = all cores
+
 # Initialize MongoDB document store
 document_store = MongoDocumentStore(
     mongo_url=os.getenv("MONGODB_URI"),
@@ -18,36 +21,28 @@ def init_document_store():
         archive_folder = "./archive_texts"
         documents = []
         
-        for filename in os.listdir(archive_folder):
-            if filename.endswith(".txt"):
-                try:
-                    with open(os.path.join(archive_folder, filename), "r", encoding="utf-8") as file:
-                        content = file.read()
-                        metadata, article_content = parse_article_content(content)
-                        
-                        # Extract date from filename
-                        file_date = None
-                        for part in filename.split('_'):
-                            if len(part) == 8 and part.isdigit():
-                                year = part[:4]
-                                month = part[4:6]
-                                day = part[6:]
-                                file_date = f"{year}-{month}-{day}"
-                                break
-                        
-                        documents.append({
-                            "content": article_content,
-                            "meta": {
-                                "name": filename,
-                                "title": metadata.get("title", os.path.splitext(filename)[0]),
-                                "author": metadata.get("author", "Unknown"),
-                                "publishDate": metadata.get("date", file_date),
-                                "source": "archive"
-                            }
-                        })
-                        print(f"Processed: {filename}")
-                except Exception as e:
-                    print(f"Error processing {filename}: {str(e)}")
+        text_files = [f for f in os.listdir(archive_folder) if f.endswith(".txt")]
+        
+        # Files are read and parsed across all cores, results arrive in order
+        for article in iter_parsed_articles(archive_folder, text_files, ingest_workers):
+            filename = article["filename"]
+            if article["error"]:
+                print(f"Error processing {filename}: {article['error']}")
+                continue
+            
+            metadata = article["metadata"]
+            documents.append({
+                "content": article["content"],
+                "meta": {
+                    "name": filename,
+                    "title": metadata.get("title", os.path.splitext(filename)[0]),
+                    "author": metadata.get("author", "Unknown"),
+                    "publishDate": metadata.get("date", article["file_date"]),
+                    "summary": article["summary"],
+                    "source": "archive"
+                }
+            })
+            print(f"Processed: {filename}")
         
         if documents:
             # Write documents in batches
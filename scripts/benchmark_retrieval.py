@@ -0,0 +1,113 @@
+# Compare BM25 retrieval latency: Haystack's BM25Retriever against the sparse
+# engine, exhaustive and with MaxScore pruning, and check they return the same
+# top k. Long queries are word spans sampled from the corpus itself.
+# run the script python scripts/benchmark_retrieval.py [--archive ./archive_texts]
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from haystack.document_stores import InMemoryDocumentStore
+from haystack.nodes import BM25Retriever
+from haystack.schema import Document
+from app.services.bm25_engine import SparseBM25Retriever
+from app.utils.text_utils import iter_parsed_articles
+
+STOPWORDS = "the of and to in a is that for on was with as by at from it be has have are".split()
+
+def synthetic_corpus(num_docs: int, vocabulary_size: int = 50000, seed: int = 0):
+    """Zipf-distributed words with a stopword every few tokens, roughly like news text"""
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(vocabulary_size)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    documents = []
+    for _ in range(num_docs):
+        length = rng.randint(100, 800)
+        words = rng.choices(vocabulary, weights=weights, k=length)
+        for i in range(0, length, 3):
+            words[i] = rng.choice(STOPWORDS)
+        documents.append(" ".join(words))
+    return documents
+
+def archive_corpus(archive_folder: str):
+    filenames = [f for f in os.listdir(archive_folder) if f.endswith(".txt")]
+    return [
+        article["content"]
+        for article in iter_parsed_articles(archive_folder, filenames)
+        if not article["error"] and not article["empty"]
+    ]
+
+def sample_queries(texts, num_queries: int, query_length: int, seed: int = 1):
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < num_queries:
+        words = rng.choice(texts).split()
+        if len(words) < query_length:
+            continue
+        start = rng.randrange(len(words) - query_length + 1)
+        queries.append(" ".join(words[start:start + query_length]))
+    return queries
+
+def time_queries(retrieve, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(retrieve(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 retrieval")
+    parser.add_argument("--archive", help="Folder of archive .txt files (default: synthetic corpus)")
+    parser.add_argument("--docs", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-length", type=int, default=12, help="Words per query")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    texts = archive_corpus(args.archive) if args.archive else synthetic_corpus(args.docs)
+    print(f"Indexing {len(texts)} documents...")
+    document_store = InMemoryDocumentStore(use_bm25=True, progress_bar=False)
+    document_store.write_documents([Document(content=text) for text in texts])
+    queries = sample_queries(texts, args.queries, args.query_length)
+
+    started = time.perf_counter()
+    sparse = SparseBM25Retriever(document_store, pruning=False)
+    sparse.get_index()
+    print(f"Sparse index built in {time.perf_counter() - started:.2f}s")
+    pruned = SparseBM25Retriever(document_store, pruning=True)
+    pruned.get_index()
+    retrievers = {
+        "haystack BM25Retriever": BM25Retriever(document_store),
+        "sparse exhaustive": sparse,
+        "sparse MaxScore": pruned
+    }
+
+    baseline = None
+    print(f"{args.queries} queries of {args.query_length} words, top_k={args.top_k}")
+    for name, retriever in retrievers.items():
+        results, latencies = time_queries(
+            lambda query: retriever.retrieve(query=query, top_k=args.top_k, scale_score=False), queries
+        )
+        scores = [[doc.score for doc in docs] for docs in results]
+        if baseline is None:
+            baseline = scores
+        same = all(np.allclose(a, b, rtol=1e-12, atol=0) for a, b in zip(scores, baseline))
+        print(
+            f"  {name:24s} mean {np.mean(latencies):8.3f} ms  "
+            f"p50 {np.percentile(latencies, 50):8.3f} ms  p99 {np.percentile(latencies, 99):8.3f} ms  "
+            f"same top-k scores: {same}"
+        )
+
+if __name__ == "__main__":
+    main()
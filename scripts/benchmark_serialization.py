@@ -0,0 +1,98 @@
+# Compare response encoding per endpoint: FastAPI's default path (jsonable_encoder
+# then JSONResponse) against FastJSONResponse (orjson straight to bytes).
+# Payloads are shaped like the real /articles, /articles/{id}, /search and /query
+# responses of app.py and the MongoDB /articles of app/main.py.
+# run the script python scripts/benchmark_serialization.py [--repeat 200]
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.json_utils import FastJSONResponse
+
+def text(rng, length: int):
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(length // 6 + 1)]
+    return " ".join(words)[:length]
+
+def payloads(rng):
+    article = lambda i: {
+        "id": f"{i:032x}",
+        "title": text(rng, 60),
+        "content": text(rng, 2000),
+        "publishDate": f"2006-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "author": text(rng, 15)
+    }
+    search_result = lambda i: {
+        "id": f"{i:032x}",
+        "title": text(rng, 60),
+        "preview": f"...{text(rng, 400)}...",
+        "highlights": [[rng.randint(0, 390), rng.randint(0, 400)] for _ in range(4)],
+        "score": rng.random(),
+        "publishDate": "2006-11-17",
+        "author": text(rng, 15)
+    }
+    stored = lambda i: {
+        "_id": ObjectId(),
+        "title": text(rng, 60),
+        "content": text(rng, 6000),
+        "content_hash": "%064x" % rng.getrandbits(256),
+        "author": text(rng, 15),
+        "publish_date": datetime(2006, 1, 1) + timedelta(days=i),
+        "filename": f"article_{i}.txt",
+        "last_updated": datetime.utcnow(),
+        "created_at": datetime.utcnow()
+    }
+    return {
+        "/articles (app.py, limit=100)": {
+            "results": [article(i) for i in range(100)], "total": 100000, "page": 1, "limit": 100, "next_cursor": "x"
+        },
+        "/articles/{id} (app.py, 50 KB)": {**article(0), "content": text(rng, 50000)},
+        "/search (app.py)": {"results": [search_result(i) for i in range(5)], "total": 5, "query": "city council"},
+        "/query (app.py)": {
+            "answer": text(rng, 40), "confidence": 0.42, "context": text(rng, 1000),
+            "source": {"id": "0" * 32, "title": text(rng, 60), "author": text(rng, 15), "publishDate": "2006-11-17"}
+        },
+        "/articles (app/main.py, limit=50)": {
+            "total": 100000, "page": 1, "limit": 50, "articles": [stored(i) for i in range(50)], "next_cursor": "x"
+        }
+    }
+
+def default_path(content):
+    # What FastAPI does with a returned dict; main.py also stringified ObjectIds first
+    return JSONResponse(jsonable_encoder(content, custom_encoder={ObjectId: str})).body
+
+def fast_path(content):
+    return FastJSONResponse(content).body
+
+def time_encoder(encode, content, repeat: int):
+    encode(content)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode(content)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, content in payloads(random.Random(0)).items():
+        default_us = time_encoder(default_path, content, args.repeat)
+        fast_us = time_encoder(fast_path, content, args.repeat)
+        size = len(fast_path(content))
+        print(f"  {name:36s} {size / 1024:7.1f} KB  default {default_us:9.1f} us  "
+              f"orjson {fast_us:8.1f} us  {default_us / fast_us:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
-from pymongo import MongoClient
+import argparse
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from datetime import datetime
 import sys
 from dotenv import load_dotenv
@@ -7,11 +9,12 @@ from dotenv import load_dotenv
 # Add the parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.utils.text_utils import parse_article_content
+from app.utils.text_utils import iter_parsed_articles
+from app.utils.manifest_utils import load_manifest, new_manifest, save_manifest, manifest_entry, diff_archive
 
 load_dotenv()
 
-def import_articles():
+def get_collection():
     # Connect to MongoDB
     client = MongoClient(os.getenv("MONGODB_URI"))
     db = client[os.getenv("DB_NAME", "news_db")]
@@ -19,9 +22,59 @@ def import_articles():
     
     # Create an index on filename to make lookups faster
     collection.create_index("filename", unique=True)
+    return collection
+
+def build_document(article):
+    """Build the stored article document from a parsed archive file"""
+    filename = article["filename"]
+    file_date = article["file_date"]
     
-    # Path to articles
-    archive_folder = "./archive_texts"
+    return {
+        "title": article["metadata"].get("title", os.path.splitext(filename)[0]),
+        "content": article["content"],
+        # Precomputed so list endpoints can project it instead of the content
+        "summary": article["summary"],
+        "content_hash": article["content_hash"],
+        "author": article["metadata"].get("author", "Unknown"),
+        "publish_date": datetime.strptime(file_date, "%Y-%m-%d") if file_date else None,
+        "filename": filename,
+        "last_updated": datetime.utcnow()
+    }
+
+def list_archive_files(archive_folder):
+    return [filename for filename in os.listdir(archive_folder) if filename.endswith(".txt")]
+
+def plan_import(archive_folder, manifest, stats):
+    """Pick the files that need parsing, and the ones deleted since the last run"""
+    text_files = list_archive_files(archive_folder)
+    if manifest is None:
+        return text_files, []
+    
+    changed, unchanged, deleted = diff_archive(archive_folder, text_files, manifest)
+    stats["skipped"] += len(unchanged)
+    return changed, deleted
+
+def remove_deleted(collection, deleted, manifest):
+    """Drop articles whose archive files are gone
+    
+    Reported here rather than in the stats, whose keys cron wrappers rely on.
+    """
+    if not deleted:
+        return
+    
+    result = collection.delete_many({"filename": {"$in": deleted}})
+    for filename in deleted:
+        manifest["files"].pop(filename, None)
+        print(f"Deleted {filename}")
+    print(f"Removed {result.deleted_count} articles whose files are gone")
+
+def record_file(manifest, archive_folder, filename, content_hash, doc_id):
+    if manifest is not None:
+        manifest["files"][filename] = manifest_entry(archive_folder, filename, content_hash, str(doc_id))
+
+def import_articles(collection=None, archive_folder="./archive_texts", workers=None, manifest=None):
+    if collection is None:
+        collection = get_collection()
     
     # Track statistics
     stats = {
@@ -31,67 +84,199 @@ def import_articles():
         "errors": 0
     }
     
-    # Process each file
-    for filename in os.listdir(archive_folder):
-        if filename.endswith(".txt"):
-            try:
-                # Check if article already exists
-                existing_article = collection.find_one({"filename": filename})
+    filenames, deleted = plan_import(archive_folder, manifest, stats)
+    remove_deleted(collection, deleted, manifest)
+    
+    # Files are read and parsed on a process pool; writes stay in this process
+    for article in iter_parsed_articles(archive_folder, filenames, workers):
+        filename = article["filename"]
+        try:
+            if article["error"]:
+                raise ValueError(article["error"])
+            
+            # Touched but identical files only need their manifest entry refreshed
+            known = manifest["files"].get(filename) if manifest is not None else None
+            if known and known["content_hash"] == article["content_hash"]:
+                record_file(manifest, archive_folder, filename, article["content_hash"], known["doc_id"])
+                print(f"Skipped {filename} (no changes)")
+                stats["skipped"] += 1
+                continue
+            
+            # Check if article already exists
+            existing_article = collection.find_one({"filename": filename})
+            document = build_document(article)
+            
+            if existing_article:
+                # Update existing article if content has changed or it predates summaries
+                if existing_article.get("content") != document["content"] or "summary" not in existing_article:
+                    collection.update_one(
+                        {"filename": filename},
+                        {"$set": document}
+                    )
+                    print(f"Updated {filename}")
+                    stats["updated"] += 1
+                else:
+                    print(f"Skipped {filename} (no changes)")
+                    stats["skipped"] += 1
+                doc_id = existing_article["_id"]
+            else:
+                # Insert new article
+                document["created_at"] = datetime.utcnow()
+                doc_id = collection.insert_one(document).inserted_id
+                print(f"Imported {filename}")
+                stats["processed"] += 1
+            
+            record_file(manifest, archive_folder, filename, article["content_hash"], doc_id)
                 
-                with open(os.path.join(archive_folder, filename), "r", encoding="utf-8") as file:
-                    content = file.read()
-                    metadata, article_content = parse_article_content(content)
-                    
-                    # Extract date from filename (e.g., 20061117)
-                    file_date = None
-                    for part in filename.split('_'):
-                        if len(part) == 8 and part.isdigit():
-                            year = part[:4]
-                            month = part[4:6]
-                            day = part[6:]
-                            file_date = f"{year}-{month}-{day}"
-                            break
-                    
-                    # Create document
-                    document = {
-                        "title": metadata.get("title", os.path.splitext(filename)[0]),
-                        "content": article_content,
-                        "author": metadata.get("author", "Unknown"),
-                        "publish_date": datetime.strptime(file_date, "%Y-%m-%d") if file_date else None,
-                        "filename": filename,
-                        "last_updated": datetime.utcnow()
-                    }
-                    
-                    if existing_article:
-                        # Update existing article if content has changed
-                        if existing_article.get("content") != article_content:
-                            collection.update_one(
-                                {"filename": filename},
-                                {"$set": document}
-                            )
-                            print(f"Updated {filename}")
-                            stats["updated"] += 1
-                        else:
-                            print(f"Skipped {filename} (no changes)")
-                            stats["skipped"] += 1
-                    else:
-                        # Insert new article
-                        document["created_at"] = datetime.utcnow()
-                        collection.insert_one(document)
-                        print(f"Imported {filename}")
-                        stats["processed"] += 1
-                    
-            except Exception as e:
-                print(f"Error processing {filename}: {str(e)}")
-                stats["errors"] += 1
+        except Exception as e:
+            print(f"Error processing {filename}: {str(e)}")
+            stats["errors"] += 1
 
     return stats
 
+def flush_operations(collection, operations, stats):
+    """Send pending upserts as one unordered bulk write
+    
+    Returns (operation, upserted _id or None) for every write that succeeded.
+    """
+    if not operations:
+        return []
+    
+    failed = set()
+    try:
+        result = collection.bulk_write([operation[0] for operation in operations], ordered=False)
+        upserted_ids = result.upserted_ids or {}
+    except BulkWriteError as e:
+        # Unordered writes keep going past failures, so only undo the
+        # stats of the operations that were actually rejected
+        upserted_ids = {upsert["index"]: upsert["_id"] for upsert in e.details.get("upserted", [])}
+        for error in e.details.get("writeErrors", []):
+            _, kind, filename, _ = operations[error["index"]]
+            failed.add(error["index"])
+            stats[kind] -= 1
+            stats["errors"] += 1
+            print(f"Error writing {filename}: {error.get('errmsg')}")
+    except PyMongoError as e:
+        # Network errors, timeouts...: which writes landed is unknown, so the
+        # whole batch counts as failed and stays out of the manifest to be
+        # retried next run. The import carries on with the next batch
+        upserted_ids = {}
+        for index, (_, kind, filename, _) in enumerate(operations):
+            failed.add(index)
+            stats[kind] -= 1
+            stats["errors"] += 1
+            print(f"Error writing {filename}: {str(e)}")
+    
+    written = [
+        (operation, upserted_ids.get(index))
+        for index, operation in enumerate(operations)
+        if index not in failed
+    ]
+    operations.clear()
+    return written
+
+def import_articles_bulk(collection=None, archive_folder="./archive_texts", batch_size=500, workers=None,
+                         manifest=None):
+    """Import articles using content hashes and batched unordered upserts
+    
+    Only {filename, content_hash} is read back from MongoDB, in a single
+    projected query, so unchanged files cost no round trips at all. With a
+    manifest, files whose size and mtime are unchanged are not even read.
+    """
+    if collection is None:
+        collection = get_collection()
+    
+    stats = {
+        "processed": 0,
+        "skipped": 0,
+        "updated": 0,
+        "errors": 0
+    }
+    
+    filenames, deleted = plan_import(archive_folder, manifest, stats)
+    remove_deleted(collection, deleted, manifest)
+    if not filenames:
+        return stats
+    
+    known_articles = {
+        article["filename"]: (article.get("content_hash"), article["_id"])
+        for article in collection.find({}, {"filename": 1, "content_hash": 1})
+    }
+    # Articles imported before summaries existed get rewritten once to add one;
+    # normally none match, so this doesn't read the summaries back
+    for article in collection.find({"summary": {"$exists": False}}, {"filename": 1}):
+        if article["filename"] in known_articles:
+            known_articles[article["filename"]] = (None, article["_id"])
+    
+    def flush():
+        for (_, _, filename, content_hash), upserted_id in flush_operations(collection, operations, stats):
+            doc_id = upserted_id if upserted_id is not None else known_articles[filename][1]
+            record_file(manifest, archive_folder, filename, content_hash, doc_id)
+    
+    operations = []
+    for article in iter_parsed_articles(archive_folder, filenames, workers):
+        filename = article["filename"]
+        if article["error"]:
+            print(f"Error processing {filename}: {article['error']}")
+            stats["errors"] += 1
+            continue
+        
+        known = known_articles.get(filename)
+        if known and known[0] == article["content_hash"]:
+            record_file(manifest, archive_folder, filename, article["content_hash"], known[1])
+            stats["skipped"] += 1
+            continue
+        
+        try:
+            document = build_document(article)
+        except Exception as e:
+            print(f"Error processing {filename}: {str(e)}")
+            stats["errors"] += 1
+            continue
+        
+        kind = "updated" if known else "processed"
+        operations.append((
+            UpdateOne(
+                {"filename": filename},
+                {"$set": document, "$setOnInsert": {"created_at": datetime.utcnow()}},
+                upsert=True
+            ),
+            kind,
+            filename,
+            article["content_hash"]
+        ))
+        stats[kind] += 1
+        
+        if len(operations) >= batch_size:
+            flush()
+    
+    flush()
+    return stats
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import archive articles into MongoDB")
+    parser.add_argument("--bulk", action="store_true",
+                        help="compare content hashes and write changes with batched bulk upserts")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="number of upserts per bulk write (with --bulk)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of parse processes (default: all cores, 1 parses in-process)")
+    parser.add_argument("--manifest", default=os.getenv("IMPORT_MANIFEST", "./archive_texts/.import_manifest.json"),
+                        help="ingest manifest used to skip unchanged files and remove deleted ones")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the manifest and re-read every file (e.g. after the collection was wiped)")
+    args = parser.parse_args()
+    
+    manifest = new_manifest() if args.full else load_manifest(args.manifest)
+    
     print("Starting article import...")
-    stats = import_articles()
+    if args.bulk:
+        stats = import_articles_bulk(batch_size=args.batch_size, workers=args.workers, manifest=manifest)
+    else:
+        stats = import_articles(workers=args.workers, manifest=manifest)
+    save_manifest(args.manifest, manifest)
     print("\nImport completed!")
     print(f"Articles processed: {stats['processed']}")
     print(f"Articles skipped (no changes): {stats['skipped']}")
     print(f"Articles updated: {stats['updated']}")
-    print(f"Errors encountered: {stats['errors']}")
\ No newline at end of file
+    print(f"Errors encountered: {stats['errors']}")
@@ -26,6 +26,10 @@ def init_mongodb():
         print("Creating index on 'publish_date' field...")
         collection.create_index("publish_date", name="publish_date_index")
         
+        # Compound index for /articles cursor pagination, newest first
+        print("Creating index on 'publish_date' and '_id' fields...")
+        collection.create_index([("publish_date", -1), ("_id", -1)], name="publish_date_id_index")
+        
         print("Indexes created successfully!")
         
         # Verify indexes
@@ -0,0 +1,42 @@
+# Serve the QA model's forward passes to the API workers over a Unix socket,
+# so the model is loaded once per server process instead of once per API worker.
+# Start it before the API with READER_BACKEND=remote and the same READER_SOCKET.
+# run the script python scripts/model_server.py [--processes 2]
+
+import argparse
+import os
+import sys
+from functools import partial
+
+from dotenv import load_dotenv
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.model_server import serve
+from app.services.onnx_reader import create_session, run_session
+from app.utils.log_utils import configure_logging
+
+load_dotenv()
+configure_logging()
+
+def load_forward(model_dir, onnx_dir, quantize, num_threads):
+    session = create_session(model_dir, onnx_dir, quantize, num_threads)
+    return partial(run_session, session)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the QA model server")
+    parser.add_argument("--socket", default=os.getenv("READER_SOCKET", "/tmp/news-api-reader.sock"))
+    parser.add_argument("--model-dir", default="./models/distilbert-base-uncased-distilled-squad")
+    parser.add_argument("--onnx-dir", default=os.getenv("ONNX_DIR") or None)
+    parser.add_argument("--quantize", action="store_true",
+                        default=os.getenv("ONNX_QUANTIZE", "false").lower() in ("1", "true", "yes"))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("ONNX_THREADS", "0")) or None,
+                        help="ONNX Runtime threads per process (default: all cores)")
+    parser.add_argument("--processes", type=int, default=1, help="model processes sharing the socket")
+    args = parser.parse_args()
+    
+    # Export once up front rather than racing to do it in every process
+    create_session(args.model_dir, args.onnx_dir, args.quantize, args.threads)
+    serve(args.socket, partial(load_forward, args.model_dir, args.onnx_dir, args.quantize, args.threads),
+          processes=args.processes)
@@ -0,0 +1,22 @@
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import app.main as main
+
+@pytest.fixture
+def api(monkeypatch):
+    """TestClient of app/main.py backed by an in-process mongomock-motor collection"""
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(main, "create_client", lambda *args, **kwargs: client)
+    with TestClient(main.app) as test_client:
+        test_client.collection = client["news_db"]["articles"]
+        yield test_client
+
+@pytest.fixture
+def insert(api):
+    """Insert documents on the app's event loop, returns them with their _ids"""
+    def insert_documents(documents):
+        api.portal.call(api.collection.insert_many, documents)
+        return documents
+    return insert_documents
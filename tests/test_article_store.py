@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services.article_store import ArticleStore, ArticleStoreTimeout
+
+class SlowCollection:
+    """Collection whose operations never finish in time"""
+
+    async def estimated_document_count(self, **kwargs):
+        await asyncio.sleep(5)
+
+def test_find_sorts_skips_and_limits():
+    async def run():
+        collection = AsyncMongoMockClient()["news_db"]["articles"]
+        await collection.insert_many([{"title": f"t{i}", "rank": i} for i in range(10)])
+        store = ArticleStore(collection, timeout_ms=1000)
+        articles = await store.find({}, {"rank": 1}, sort=[("rank", -1)], skip=2, limit=3)
+        return articles, await store.count()
+
+    articles, count = asyncio.run(run())
+    assert [article["rank"] for article in articles] == [7, 6, 5]
+    assert all(set(article) == {"_id", "rank"} for article in articles)
+    assert count == 10
+
+def test_slow_operation_raises_timeout():
+    store = ArticleStore(SlowCollection(), timeout_ms=10)
+    with pytest.raises(ArticleStoreTimeout):
+        asyncio.run(store.count())
@@ -0,0 +1,92 @@
+from datetime import date
+
+import numpy as np
+import pytest
+from haystack.schema import Document
+
+from app.services.bitmap_index import ARRAY_CONTAINER_MAX, Bitmap, MetadataIndex, union
+
+def bitmap(positions):
+    return Bitmap.from_sorted(np.array(sorted(positions), dtype=np.int64))
+
+rng = np.random.default_rng(3)
+SETS = {
+    "empty": set(),
+    "zero": {0},
+    # Last position of the first container and first of the second
+    "boundary": {65535, 65536},
+    "full_array": set(range(0, 2 * ARRAY_CONTAINER_MAX, 2)),
+    "first_bitset": set(range(1, 2 * ARRAY_CONTAINER_MAX + 3, 2)),
+    "dense": set(rng.choice(1 << 17, size=30000, replace=False).tolist()),
+    "sparse": set(rng.choice(1 << 18, size=500, replace=False).tolist()) | {65535, 131072}
+}
+
+def test_containers_switch_to_bitsets_past_the_array_limit():
+    assert bitmap(SETS["full_array"]).containers[0].dtype == np.uint16
+    assert bitmap(SETS["first_bitset"]).containers[0].dtype == np.uint64
+    assert sorted(bitmap(SETS["boundary"]).containers) == [0, 1]
+
+@pytest.mark.parametrize("name", SETS)
+def test_round_trip(name):
+    positions = SETS[name]
+    assert bitmap(positions).to_array().tolist() == sorted(positions)
+    assert len(bitmap(positions)) == len(positions)
+
+@pytest.mark.parametrize("left", SETS)
+@pytest.mark.parametrize("right", SETS)
+def test_intersection_and_union_match_sets(left, right):
+    a, b = SETS[left], SETS[right]
+    assert (bitmap(a) & bitmap(b)).to_array().tolist() == sorted(a & b)
+    assert (bitmap(a) | bitmap(b)).to_array().tolist() == sorted(a | b)
+    assert len(bitmap(a) & bitmap(b)) == len(a & b)
+
+def test_intersection_drops_emptied_containers():
+    both = bitmap({1, 65536}) & bitmap({2, 65536})
+    assert sorted(both.containers) == [1]
+    assert (bitmap(SETS["full_array"]) & bitmap(SETS["first_bitset"])).containers == {}
+
+def test_union_of_many():
+    assert union([]).to_array().tolist() == []
+    names = list(SETS)
+    assert union([bitmap(SETS[name]) for name in names]).to_array().tolist() == sorted(set().union(*SETS.values()))
+    # Arrays that only add up past the limit become one bitset
+    halves = [bitmap(range(0, ARRAY_CONTAINER_MAX)), bitmap(range(ARRAY_CONTAINER_MAX, ARRAY_CONTAINER_MAX + 10))]
+    merged = union(halves)
+    assert merged.containers[0].dtype == np.uint64
+    assert merged.to_array().tolist() == list(range(ARRAY_CONTAINER_MAX + 10))
+
+@pytest.fixture
+def metadata():
+    dates = ["2020-01-31", "2020-02-01", "2020-02-15", "2020-02-29", "2020-03-01", None, "not a date"]
+    authors = ["Ann Lee", "ann lee ", "Bo", "Bo", "Cy", "Ann Lee", "Bo"]
+    return MetadataIndex([
+        Document(content=f"doc {i}", meta={"author": author, "publishDate": day})
+        for i, (author, day) in enumerate(zip(authors, dates))
+    ])
+
+def test_author_filter_ignores_case_and_spaces(metadata):
+    assert metadata.select({"author": "ANN LEE"}).to_array().tolist() == [0, 1, 5]
+    assert metadata.select({"author": {"$in": ["bo", "cy"]}}).to_array().tolist() == [2, 3, 4, 6]
+    assert metadata.select({"author": "nobody"}).to_array().tolist() == []
+
+def test_date_range_checks_days_in_boundary_months(metadata):
+    select = lambda condition: metadata.select({"publishDate": condition}).to_array().tolist()
+    assert select({"$gte": "2020-02-01", "$lte": "2020-02-29"}) == [1, 2, 3]
+    assert select({"$gte": "2020-01-31", "$lte": "2020-02-01"}) == [0, 1]
+    assert select({"$gte": "2020-02-16"}) == [3, 4]
+    assert select({"$lte": "2020-01-31"}) == [0]
+    # Undated documents never match a date range
+    assert select({"$gte": "1900-01-01"}) == [0, 1, 2, 3, 4]
+    assert metadata.date_range(date(2020, 2, 2), date(2020, 2, 14)).to_array().tolist() == []
+
+def test_filters_are_anded(metadata):
+    assert metadata.select({"author": "bo", "publishDate": {"$gte": "2020-02-20"}}).to_array().tolist() == [3]
+    assert metadata.select({}).to_array().tolist() == list(range(7))
+
+@pytest.mark.parametrize("filters", [
+    {"title": "x"}, {"author": {"$eq": "bo"}}, {"publishDate": "2020-01-01"}, {"publishDate": {"$gt": "2020-01-01"}},
+    {"publishDate": {"$gte": "soon"}}
+])
+def test_unsupported_filters_raise(metadata, filters):
+    with pytest.raises(ValueError):
+        metadata.select(filters)
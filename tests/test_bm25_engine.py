@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+from haystack.document_stores import InMemoryDocumentStore
+from haystack.nodes import BM25Retriever
+from haystack.schema import Document
+
+from app.services.bm25_engine import MATRIX_ARRAYS, OCCURRENCE_ARRAYS, SparseBM25Retriever
+
+TEXTS = [
+    "The museum opened its new wing to the public on Saturday.",
+    "City council approved the museum budget after a long debate.",
+    "The debate team won the regional championship again.",
+    "Council members debated the budget, the museum and the library.",
+    "A new library wing opens next spring, the council said.",
+    "Saturday's game was postponed because of the storm.",
+    "The storm closed the museum and the library for a day.",
+    "Budget talks continue; the council meets again on Monday."
+]
+
+@pytest.fixture
+def store():
+    store = InMemoryDocumentStore(use_bm25=True)
+    store.write_documents([
+        Document(content=text, meta={"author": "Staff", "publishDate": f"2020-01-0{i + 1}"})
+        for i, text in enumerate(TEXTS)
+    ])
+    return store
+
+def test_index_is_rebuilt_from_its_state(store):
+    built = SparseBM25Retriever(store)
+    state = built.index_state()
+    assert not built.get_index().restored
+
+    restored = SparseBM25Retriever(store)
+    restored.restore_index(store.bm25[store.index], state)
+    index = restored.get_index()
+    assert index.restored
+    for name in MATRIX_ARRAYS + OCCURRENCE_ARRAYS:
+        assert np.array_equal(getattr(index, name), getattr(built.get_index(), name))
+    assert restored.snippet(index.documents[1].id, "museum budget") == built.snippet(index.documents[1].id, "museum budget")
+
+def test_state_of_another_store_is_ignored(store):
+    state = SparseBM25Retriever(store).index_state()
+    retriever = SparseBM25Retriever(store)
+    retriever.restore_index(store.bm25[store.index], state)
+    # Writing documents replaces the store's BM25, the saved arrays no longer apply
+    store.write_documents([Document(content="An entirely new article about the harbour.")])
+    index = retriever.get_index()
+    assert not index.restored
+    assert len(index.documents) == len(TEXTS) + 1
+
+def test_positions_are_built_when_the_state_has_none(store):
+    state = SparseBM25Retriever(store, positions=False).index_state()
+    assert "occurrence_starts" not in state
+    retriever = SparseBM25Retriever(store)
+    retriever.restore_index(store.bm25[store.index], state)
+    index = retriever.get_index()
+    assert not index.restored and index.occurrence_starts is not None
+
+def synthetic_corpus(num_docs=600, vocabulary=400, seed=7):
+    """Zipf-distributed words, so queries mix rare and common terms"""
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    weights = 1 / np.arange(1, vocabulary + 1)
+    weights /= weights.sum()
+    return [
+        " ".join(rng.choice(words, size=rng.integers(20, 120), p=weights))
+        for _ in range(num_docs)
+    ], words
+
+@pytest.fixture(scope="module")
+def corpus_store():
+    texts, words = synthetic_corpus()
+    store = InMemoryDocumentStore(use_bm25=True)
+    store.write_documents([Document(content=text) for text in texts])
+    rng = np.random.default_rng(11)
+    queries = [" ".join(rng.choice(words[5:], size=rng.integers(1, 6))) for _ in range(60)]
+    # Repeated terms and common terms take other paths through top_k_pruned
+    queries += ["w0 w1 w2", "w300 w300 w301", "w40 w3 w250 w250"]
+    return store, queries
+
+def test_pruned_top_k_matches_exhaustive(corpus_store, monkeypatch):
+    store, queries = corpus_store
+    index = SparseBM25Retriever(store).get_index()
+    exhaustive = index.top_k
+    fallbacks = []
+    monkeypatch.setattr(index, "top_k", lambda *args, **kwargs: fallbacks.append(1) or exhaustive(*args, **kwargs))
+    for query in queries:
+        term_ids = index.term_ids(query.split())
+        for top_k in (1, 5, 10, 50):
+            pruned_positions, pruned_scores = index.top_k_pruned(term_ids, top_k)
+            positions, scores = exhaustive(term_ids, top_k)
+            assert pruned_positions.tolist() == positions.tolist(), (query, top_k)
+            assert np.allclose(pruned_scores, scores, rtol=1e-12, atol=0)
+    # Most queries were actually pruned, not handed back to the exhaustive path
+    assert len(fallbacks) < len(queries) * 4 / 2
+
+def test_scores_match_the_store(corpus_store):
+    store, queries = corpus_store
+    index = SparseBM25Retriever(store).get_index()
+    bm25 = store.bm25[store.index]
+    for query in queries:
+        tokens = store.bm25_tokenization_regex(query.lower())
+        assert np.allclose(index.scores(index.term_ids(tokens)), bm25.get_scores(tokens), rtol=1e-12, atol=1e-12)
+
+def test_results_match_haystack_retriever(corpus_store):
+    store, queries = corpus_store
+    sparse = SparseBM25Retriever(store)
+    haystack = BM25Retriever(store)
+    for query in queries:
+        for scale_score in (False, True):
+            ours = sparse.retrieve(query, top_k=10, scale_score=scale_score)
+            theirs = haystack.retrieve(query, top_k=10, scale_score=scale_score)
+            assert np.allclose([doc.score for doc in ours], [doc.score for doc in theirs], rtol=1e-12, atol=0)
+            # Equal scores may be ordered differently, so compare per score
+            assert sorted((round(doc.score, 9), doc.id) for doc in ours if doc.score > ours[-1].score) == \
+                sorted((round(doc.score, 9), doc.id) for doc in theirs if doc.score > theirs[-1].score)
+
+def test_ties_come_back_in_store_order():
+    store = InMemoryDocumentStore(use_bm25=True)
+    documents = [Document(content=f"museum opening {n}") for n in ("one", "two", "three", "four")]
+    store.write_documents(documents)
+    retrieved = SparseBM25Retriever(store).retrieve("museum opening", top_k=4)
+    assert len({doc.score for doc in retrieved}) == 1
+    assert [doc.id for doc in retrieved] == [doc.id for doc in documents]
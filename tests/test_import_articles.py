@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect
+
+from app.utils.manifest_utils import new_manifest
+from scripts.import_articles import import_articles, import_articles_bulk
+
+STATS_KEYS = {"processed", "skipped", "updated", "errors"}
+
+def write_article(folder, filename, title, body):
+    (folder / filename).write_text(f"Title: {title}\nAuthor: Staff\n---\n{body}\n", encoding="utf-8")
+
+@pytest.fixture
+def archive(tmp_path):
+    for day in range(1, 6):
+        write_article(tmp_path, f"paper_2020010{day}_{day}.txt", f"Story {day}", f"Body of story {day}.")
+    return tmp_path
+
+class Collection:
+    """mongomock collection taking pymongo UpdateOne requests in bulk_write()
+
+    mongomock's own bulk API predates the installed pymongo's operations.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def bulk_write(self, requests, ordered=True):
+        upserted_ids = {}
+        for index, request in enumerate(requests):
+            result = self._collection.update_one(request._filter, request._doc, upsert=request._upsert)
+            if result.upserted_id is not None:
+                upserted_ids[index] = result.upserted_id
+        return SimpleNamespace(upserted_ids=upserted_ids)
+
+@pytest.fixture
+def collection():
+    collection = mongomock.MongoClient()["news_db"]["articles"]
+    collection.create_index("filename", unique=True)
+    return Collection(collection)
+
+def test_bulk_import_keeps_the_stats_keys(archive, collection):
+    stats = import_articles_bulk(collection, str(archive), batch_size=2, workers=1)
+    assert set(stats) == STATS_KEYS
+    assert stats == {"processed": 5, "skipped": 0, "updated": 0, "errors": 0}
+    assert set(import_articles(collection, str(archive), workers=1)) == STATS_KEYS
+
+def test_bulk_import_skips_unchanged_and_updates_changed(archive, collection):
+    import_articles_bulk(collection, str(archive), workers=1)
+    write_article(archive, "paper_20200101_1.txt", "Story 1", "A corrected body.")
+    stats = import_articles_bulk(collection, str(archive), workers=1)
+    assert stats == {"processed": 0, "skipped": 4, "updated": 1, "errors": 0}
+    assert collection.find_one({"filename": "paper_20200101_1.txt"})["content"].startswith("A corrected body.")
+
+def test_bulk_import_rewrites_articles_without_a_summary(archive, collection):
+    import_articles_bulk(collection, str(archive), workers=1)
+    collection.update_one({"filename": "paper_20200102_2.txt"}, {"$unset": {"summary": ""}})
+    stats = import_articles_bulk(collection, str(archive), workers=1)
+    assert stats["updated"] == 1 and stats["skipped"] == 4
+    assert "summary" in collection.find_one({"filename": "paper_20200102_2.txt"})
+
+def test_failed_batch_is_counted_and_the_import_goes_on(archive, collection, monkeypatch):
+    bulk_write = collection.bulk_write
+    calls = []
+
+    def flaky_bulk_write(requests, **kwargs):
+        calls.append(len(requests))
+        if len(calls) == 1:
+            raise AutoReconnect("connection reset")
+        return bulk_write(requests, **kwargs)
+
+    monkeypatch.setattr(collection, "bulk_write", flaky_bulk_write)
+    manifest = new_manifest()
+    stats = import_articles_bulk(collection, str(archive), batch_size=2, workers=1, manifest=manifest)
+    assert calls == [2, 2, 1]
+    assert stats == {"processed": 3, "skipped": 0, "updated": 0, "errors": 2}
+    # The failed batch isn't recorded, so the next run retries it
+    assert len(manifest["files"]) == 3
+    monkeypatch.setattr(collection, "bulk_write", bulk_write)
+    stats = import_articles_bulk(collection, str(archive), workers=1, manifest=manifest)
+    assert stats == {"processed": 2, "skipped": 3, "updated": 0, "errors": 0}
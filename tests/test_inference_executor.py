@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.inference_executor import InferenceExecutor, InferenceQueueFull
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(workers=1, max_queue=1)
+    yield executor
+    executor.shutdown()
+
+def block(executor):
+    """Occupy the only worker until the returned event is set"""
+    started = threading.Event()
+    release = threading.Event()
+    executor.submit(lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    return release
+
+def test_full_queue_is_rejected(executor):
+    release = block(executor)
+    executor.submit(lambda: None)
+    with pytest.raises(InferenceQueueFull):
+        executor.submit(lambda: None)
+    release.set()
+    assert executor.stats()["rejected"] == 1
+
+def test_cancelled_job_gives_its_slot_back(executor):
+    release = block(executor)
+    queued = executor.submit(lambda: None)
+    assert executor.stats()["queue_depth"] == 1
+    assert queued.cancel()
+    stats = executor.stats()
+    assert stats["queue_depth"] == 0 and stats["cancelled"] == 1
+    # The slot is usable again
+    follow_up = executor.submit(lambda: 1)
+    release.set()
+    assert follow_up.result(5) == 1
+    assert executor.stats()["queue_depth"] == 0
+
+def test_cancelled_await_gives_its_slot_back(executor):
+    # What a streamed /query does when its client disconnects mid-step
+    release = block(executor)
+
+    async def scenario():
+        waiter = asyncio.ensure_future(asyncio.wrap_future(executor.submit(lambda: None)))
+        await asyncio.sleep(0)
+        assert executor.stats()["queue_depth"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    release.set()
+    assert executor.stats()["queue_depth"] == 0
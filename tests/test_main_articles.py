@@ -0,0 +1,87 @@
+import asyncio
+import random
+from datetime import datetime
+
+import app.main as main
+
+def make_articles(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        {
+            "title": f"Article {i}",
+            "summary": f"Summary {i}",
+            "content": f"Content {i}",
+            "author": f"Author {i % 3}",
+            # Shared dates exercise the _id tie-break, every 7th article is undated
+            "publish_date": datetime(2006, 1, 1 + rng.randrange(5)) if i % 7 else None
+        }
+        for i in range(count)
+    ]
+
+def brute_force_order(articles):
+    """Ids newest first, undated articles last, _id breaking ties"""
+    ordered = sorted(articles, key=lambda a: (a["publish_date"] or datetime.min, a["_id"]), reverse=True)
+    return [str(article["_id"]) for article in ordered]
+
+def walk(api, limit: int, **params):
+    ids, cursor, pages = [], None, []
+    while True:
+        response = api.get("/articles", params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page)
+        ids += [article["_id"] for article in page["articles"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids, pages
+
+def test_cursor_walk_matches_brute_force_order(api, insert):
+    articles = insert(make_articles(53))
+    expected = brute_force_order(articles)
+    for limit in (1, 5, 50):
+        ids, pages = walk(api, limit)
+        assert ids == expected
+        assert all(page["total"] == 53 for page in pages)
+        assert pages[0]["page"] == 1 and all(page["page"] is None for page in pages[1:])
+
+def test_page_numbers_match_cursor_walk(api, insert):
+    articles = insert(make_articles(23))
+    ids = []
+    for page in range(1, 6):
+        ids += [article["_id"] for article in api.get("/articles", params={"page": page, "limit": 5}).json()["articles"]]
+    assert ids == brute_force_order(articles)
+
+def test_fields_projection_strips_unrequested_publish_date(api, insert):
+    articles = insert(make_articles(12))
+    ids, pages = walk(api, 5, fields="title,summary")
+    assert ids == brute_force_order(articles)
+    for page in pages:
+        for article in page["articles"]:
+            assert set(article) == {"_id", "title", "summary"}
+
+def test_fields_projection_keeps_requested_publish_date(api, insert):
+    insert(make_articles(3))
+    page = api.get("/articles", params={"fields": "title,publish_date"}).json()
+    assert all(set(article) == {"_id", "title", "publish_date"} for article in page["articles"])
+
+def test_unknown_field_is_400(api):
+    response = api.get("/articles", params={"fields": "title,password"})
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+    assert api.get("/search", params={"query": "x", "fields": "nope"}).status_code == 400
+
+def test_bad_cursor_is_400(api, insert):
+    insert(make_articles(3))
+    for cursor in ("not-a-cursor", "eyJ4IjogMX0", main.encode_cursor("2006-01-01T00:00:00", "not-an-objectid")):
+        response = api.get("/articles", params={"cursor": cursor})
+        assert response.status_code == 400, cursor
+
+def test_timeout_is_504(api, monkeypatch):
+    async def slow():
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(main.store, "timeout_ms", 10)
+    monkeypatch.setattr(main.store, "count", lambda: main.store._run(slow(), "count"))
+    response = api.get("/articles")
+    assert response.status_code == 504
+    assert "timed out" in response.json()["detail"]
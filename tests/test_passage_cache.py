@@ -0,0 +1,20 @@
+import numpy as np
+
+from app.services.passage_cache import widen_to_words
+
+# "unbelievable day": word 0 is three pieces, word 1 one, then a special token
+OFFSETS = np.array([[0, 2], [2, 6], [6, 12], [13, 16], [0, 0]], dtype=np.int32)
+WORD_IDS = np.array([0, 0, 0, 1, -1], dtype=np.int32)
+
+def test_widens_pieces_to_the_whole_word():
+    widened = widen_to_words(OFFSETS, WORD_IDS)
+    assert widened.tolist() == [[0, 12], [0, 12], [0, 12], [13, 16], [0, 0]]
+
+def test_word_split_by_a_window_edge_keeps_to_its_side():
+    # Like word_to_chars() on an overflowing encoding
+    assert widen_to_words(OFFSETS[1:], WORD_IDS[1:]).tolist() == [[2, 12], [2, 12], [13, 16], [0, 0]]
+    assert widen_to_words(OFFSETS[:2], WORD_IDS[:2]).tolist() == [[0, 6], [0, 6]]
+
+def test_leaves_the_cached_arrays_alone():
+    widen_to_words(OFFSETS[:2], WORD_IDS[:2])
+    assert OFFSETS[0].tolist() == [0, 2]
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.services.query_cache import QueryCache, wait_claim
+
+def test_claim_makes_one_leader_per_key():
+    cache = QueryCache()
+    future, leader = cache.claim("q")
+    waiter, follower_leads = cache.claim("q")
+    assert leader and not follower_leads
+    assert waiter is future
+    cache.complete("q", future, {"answer": "a"})
+    assert waiter.result() == {"answer": "a"}
+    assert cache.get("q") == {"answer": "a"}
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 1
+
+def test_claim_after_completion_is_a_resolved_hit():
+    cache = QueryCache()
+    future, _ = cache.claim("q")
+    cache.complete("q", future, 1)
+    again, leader = cache.claim("q")
+    assert not leader and again.result() == 1
+
+def test_failed_claim_wakes_waiters_and_is_not_cached():
+    cache = QueryCache()
+    future, _ = cache.claim("q")
+    waiter, _ = cache.claim("q")
+    cache.fail("q", future, RuntimeError("shed"))
+    with pytest.raises(RuntimeError):
+        waiter.result()
+    assert cache.get("q") is None
+    assert cache.claim("q")[1]
+
+def test_disabled_cache_never_coalesces():
+    cache = QueryCache(max_entries=0)
+    assert cache.claim("q")[1] and cache.claim("q")[1]
+    assert cache.get_or_compute("q", lambda: 2) == 2
+
+def test_cancelled_waiter_leaves_the_others_waiting():
+    cache = QueryCache()
+    future, _ = cache.claim("q")
+
+    async def scenario():
+        waiters = [asyncio.create_task(wait_claim(future)) for _ in range(3)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        assert not future.cancelled()
+        cache.complete("q", future, {"answer": "a"})
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    cancelled, *results = asyncio.run(scenario())
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert results == [{"answer": "a"}, {"answer": "a"}]
+    assert cache.get("q") == {"answer": "a"}
+
+def test_resolving_a_cancelled_claim_is_a_no_op():
+    cache = QueryCache()
+    future, _ = cache.claim("q")
+    future.cancel()
+    assert cache.complete("q", future, 1) == 1
+    other, _ = cache.claim("p")
+    other.cancel()
+    cache.fail("p", other, RuntimeError("late"))
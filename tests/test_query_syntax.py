@@ -0,0 +1,121 @@
+import re
+
+import numpy as np
+import pytest
+from haystack.document_stores import InMemoryDocumentStore
+from haystack.schema import Document
+
+from app.services.bm25_engine import SparseBM25Retriever
+from app.services.query_syntax import QuerySyntaxError, difference, evaluate, intersect, parse_query, positive_tokens
+
+tokenize = re.compile(r"(?u)\b\w\w+\b").findall
+
+TEXTS = [
+    "The museum opened its new wing to the public on Saturday.",
+    "City council approved the museum budget after a long debate.",
+    "The debate team won the regional championship again.",
+    "Council members debated the budget, the museum and the library.",
+    "A new library wing opens next spring, the council said.",
+    "Saturday's game was postponed because of the storm.",
+    "The storm closed the museum and the library for a day.",
+    "Budget talks continue; the council meets again on Monday."
+]
+
+def parse(query):
+    return parse_query(query, tokenize)
+
+@pytest.fixture(scope="module")
+def retriever():
+    store = InMemoryDocumentStore(use_bm25=True)
+    store.write_documents([Document(content=text) for text in TEXTS])
+    return SparseBM25Retriever(store)
+
+@pytest.fixture(scope="module")
+def matches(retriever):
+    """Indexes in TEXTS of the documents matching a boolean query"""
+    index = retriever.get_index()
+
+    def match(query):
+        positions = evaluate(parse(query), index)
+        return sorted(TEXTS.index(index.documents[position].content) for position in positions)
+    return match
+
+def test_words_are_anded():
+    assert parse("museum budget") == ("and", [("term", "museum"), ("term", "budget")])
+    assert parse("museum AND budget") == parse("museum budget")
+
+def test_precedence():
+    # OR binds loosest, then AND, then NOT
+    assert parse("museum OR storm AND council") == (
+        "or", [("term", "museum"), ("and", [("term", "storm"), ("term", "council")])]
+    )
+    assert parse("NOT museum budget") == ("and", [("not", ("term", "museum")), ("term", "budget")])
+    assert parse("(museum OR storm) AND council") == (
+        "and", [("or", [("term", "museum"), ("term", "storm")]), ("term", "council")]
+    )
+
+def test_phrases():
+    assert parse('"Museum Budget"') == ("phrase", ["museum", "budget"], None)
+    assert parse('"budget museum"~2') == ("phrase", ["budget", "museum"], 2)
+    # One token is a plain term, the tokenizer splits hyphenated words into a phrase
+    assert parse('"museum"') == ("term", "museum")
+    assert parse("covid-19") == ("phrase", ["covid", "19"], None)
+
+def test_unsearchable_words_leave_no_node():
+    assert parse("a") is None
+    assert parse("") is None
+    assert parse("museum AND a") == ("term", "museum")
+
+@pytest.mark.parametrize("query", ['"museum budget', 'museum "budget', "(museum OR storm", "museum AND", "NOT", "museum )"])
+def test_malformed_queries_raise(query):
+    with pytest.raises(QuerySyntaxError):
+        parse(query)
+
+def test_malformed_query_is_a_value_error_from_the_retriever(retriever):
+    # /search and /search/batch turn QuerySyntaxError into a 400 / an item error
+    with pytest.raises(QuerySyntaxError, match="Unbalanced quote"):
+        retriever.retrieve_boolean('"museum budget')
+    assert issubclass(QuerySyntaxError, ValueError)
+
+def test_positive_tokens_skip_negations():
+    assert positive_tokens(parse('"museum budget" OR storm NOT library')) == ["museum", "budget", "storm"]
+
+def test_boolean_evaluation(matches):
+    assert matches("museum") == [0, 1, 3, 6]
+    assert matches("museum library") == [3, 6]
+    assert matches("museum OR storm") == [0, 1, 3, 5, 6]
+    assert matches("museum NOT library") == [0, 1]
+    assert matches("museum AND NOT library") == [0, 1]
+    assert matches("NOT museum") == [2, 4, 5, 7]
+    assert matches("NOT museum budget") == [7]
+    assert matches("museum OR storm AND council") == [0, 1, 3, 6]
+    assert matches("(museum OR storm) AND council") == [1, 3]
+    assert matches("harbour") == []
+    assert matches("museum harbour") == []
+
+def test_phrase_evaluation(matches):
+    assert matches('"museum budget"') == [1]
+    assert matches('"the museum"') == [0, 1, 3, 6]
+    assert matches('"budget museum"') == []
+    assert matches('"museum harbour"') == []
+
+def test_proximity_evaluation(matches):
+    # Both terms within 2 + slop consecutive tokens, in either order
+    assert matches('"budget museum"~0') == [1]
+    assert matches('"budget museum"~1') == [1, 3]
+    # "the museum and the library": three tokens apart
+    assert matches('"museum library"~2') == [3, 6]
+    assert matches('"museum library"~1') == []
+
+def test_sorted_set_operations():
+    a = np.array([1, 3, 5, 7, 65535, 65536])
+    b = np.array([0, 3, 4, 7, 65536, 70000])
+    empty = np.zeros(0, dtype=np.int64)
+    assert intersect(a, b).tolist() == [3, 7, 65536]
+    assert intersect(b, a).tolist() == [3, 7, 65536]
+    assert difference(a, b).tolist() == [1, 5, 65535]
+    assert difference(b, a).tolist() == [0, 4, 70000]
+    assert intersect(a, empty).tolist() == [] and intersect(empty, a).tolist() == []
+    assert difference(a, empty).tolist() == a.tolist() and difference(empty, a).tolist() == []
+    # Needles past the end of the other list
+    assert difference(np.array([80000, 90000]), a).tolist() == [80000, 90000]
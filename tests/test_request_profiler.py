@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from app.services.request_profiler import ProfileStore, ProfilingMiddleware, token_matches
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def call(middleware, headers):
+    scope = {"type": "http", "method": "GET", "path": "/query", "query_string": b"", "headers": headers}
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages
+
+def test_token_matches():
+    assert token_matches("s3cret", "s3cret")
+    assert not token_matches("s3cre", "s3cret")
+    assert not token_matches(None, "s3cret")
+    assert not token_matches("s3cret", None)
+    # Non-ASCII header values (decoded as latin-1) and tokens don't raise
+    assert not token_matches("\xe9", "s3cret")
+    assert token_matches("clé".encode("utf-8").decode("latin-1"), "clé")
+
+def test_non_ascii_profile_header_is_ignored():
+    store = ProfileStore()
+    middleware = ProfilingMiddleware(ok_app, store, token="s3cret")
+    messages = call(middleware, [(b"x-profile", b"\xe9")])
+    assert messages[0]["status"] == 200
+    assert store.list() == []
+
+def test_profile_header_records_a_profile(tmp_path):
+    store = ProfileStore(directory=str(tmp_path))
+    middleware = ProfilingMiddleware(ok_app, store, token="s3cret")
+    messages = call(middleware, [(b"x-profile", b"s3cret")])
+    profile_id = dict(messages[0]["headers"])[b"x-profile-id"].decode()
+    # Stored by the sampler thread once it stops, not by the request
+    deadline = time.monotonic() + 2
+    while store.get(profile_id) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.get(profile_id)["status"] == 200
+    assert (tmp_path / f"{profile_id}.folded").exists()
+
+def test_finishing_a_profile_does_not_block_the_event_loop(tmp_path, monkeypatch):
+    store = ProfileStore(directory=str(tmp_path))
+    slow_add = store.add
+    monkeypatch.setattr(store, "add", lambda profile: (time.sleep(0.5), slow_add(profile)))
+    middleware = ProfilingMiddleware(ok_app, store, token="s3cret", interval=0.2)
+    started = time.perf_counter()
+    call(middleware, [(b"x-profile", b"s3cret")])
+    assert time.perf_counter() - started < 0.2